@@ -0,0 +1,32 @@
+import os
+
+
+# Authentication cache
+# ------------------------------------------------------------------------------
+# Resolved Rehive tokens are cached per process so that admin API calls do not
+# need to introspect the token on Rehive for every request. Set the TTL to 0
+# to disable the cache.
+AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 60))
+AUTH_CACHE_MAX_SIZE = int(os.environ.get('AUTH_CACHE_MAX_SIZE', 1024))
+
+# Company registry
+# ------------------------------------------------------------------------------
+# Companies used by the webhook endpoints are cached per process. Unknown
+# company identifiers are remembered for `COMPANY_CACHE_MISSING_TTL` seconds.
+COMPANY_CACHE_TTL = int(os.environ.get('COMPANY_CACHE_TTL', 30))
+COMPANY_CACHE_MISSING_TTL = int(
+    os.environ.get('COMPANY_CACHE_MISSING_TTL', 10)
+)
+COMPANY_CACHE_MAX_SIZE = int(os.environ.get('COMPANY_CACHE_MAX_SIZE', 1024))
+
+# Onfido response cache
+# ------------------------------------------------------------------------------
+# Onfido resources are cached for all workers. `database` stores responses in
+# Postgres, any other value is used as an alias from `CACHES`. Final resources
+# (eg. completed checks) never expire, other resources are cached for
+# `ONFIDO_RESPONSE_CACHE_TTL` seconds. Set the TTL to 0 to only cache final
+# resources. Expired responses are deleted from Postgres by a periodic task.
+ONFIDO_RESPONSE_CACHE = os.environ.get('ONFIDO_RESPONSE_CACHE', 'database')
+ONFIDO_RESPONSE_CACHE_TTL = int(
+    os.environ.get('ONFIDO_RESPONSE_CACHE_TTL', 60)
+)
@@ -0,0 +1,46 @@
+import os
+
+
+# Onfido clients
+# ------------------------------------------------------------------------------
+# Onfido clients are pooled per (API key, region) in each process. Each client
+# keeps a keep-alive session with up to `ONFIDO_POOL_SIZE` connections (at
+# least `PIPELINE_CONCURRENCY` if the async pipeline is enabled).
+ONFIDO_CLIENT_MAX_SIZE = int(os.environ.get('ONFIDO_CLIENT_MAX_SIZE', 64))
+ONFIDO_POOL_SIZE = int(os.environ.get('ONFIDO_POOL_SIZE', 10))
+ONFIDO_TIMEOUT = float(os.environ.get('ONFIDO_TIMEOUT', 60))
+
+# Rehive clients
+# ------------------------------------------------------------------------------
+# Rehive clients share one keep-alive session per process with up to
+# `REHIVE_POOL_SIZE` connections (at least `PIPELINE_CONCURRENCY` if the async
+# pipeline is enabled).
+REHIVE_POOL_SIZE = int(os.environ.get('REHIVE_POOL_SIZE', 10))
+REHIVE_CONNECT_TIMEOUT = float(os.environ.get('REHIVE_CONNECT_TIMEOUT', 5))
+REHIVE_READ_TIMEOUT = float(os.environ.get('REHIVE_READ_TIMEOUT', 30))
+
+# Rate limits
+# ------------------------------------------------------------------------------
+# Outbound calls are rate limited per company and upstream with token buckets
+# shared by all workers. Each bucket is refilled at `*_RATE` tokens per second
+# up to `*_BURST` tokens. Set the rate to 0 to disable a limiter. Calls wait at
+# most `RATE_LIMIT_MAX_WAIT` seconds for a token before they fail.
+ONFIDO_RATE = float(os.environ.get('ONFIDO_RATE', 6))
+ONFIDO_BURST = float(os.environ.get('ONFIDO_BURST', 20))
+REHIVE_RATE = float(os.environ.get('REHIVE_RATE', 20))
+REHIVE_BURST = float(os.environ.get('REHIVE_BURST', 40))
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 30))
+RATE_LIMIT_DATABASE = os.environ.get('RATE_LIMIT_DATABASE', 'ratelimit')
+
+# Circuit breakers
+# ------------------------------------------------------------------------------
+# Calls to an upstream (per region) fail fast once `CIRCUIT_FAILURE_THRESHOLD`
+# consecutive calls have failed. After `CIRCUIT_RECOVERY_TIMEOUT` seconds up to
+# `CIRCUIT_HALF_OPEN_CALLS` trial calls are let through to probe the upstream.
+CIRCUIT_FAILURE_THRESHOLD = int(
+    os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5)
+)
+CIRCUIT_RECOVERY_TIMEOUT = float(
+    os.environ.get('CIRCUIT_RECOVERY_TIMEOUT', 30)
+)
+CIRCUIT_HALF_OPEN_CALLS = int(os.environ.get('CIRCUIT_HALF_OPEN_CALLS', 1))
@@ -20,3 +20,9 @@ DATABASES = {
         }
     }
 }
+
+# Rate limit buckets are updated through a separate connection so that they
+# are committed immediately, even when the caller is inside a transaction.
+DATABASES['ratelimit'] = dict(
+    DATABASES['default'], TEST={'MIRROR': 'default'}
+)
@@ -0,0 +1,10 @@
+import os
+
+
+# Stats
+# ------------------------------------------------------------------------------
+# The counters of process-local components (eg. the Onfido response cache) are
+# logged by each web and worker process every `STATS_LOG_INTERVAL` seconds,
+# after the request or task that crosses the interval. Set the interval to 0 to
+# disable the stats log.
+STATS_LOG_INTERVAL = int(os.environ.get('STATS_LOG_INTERVAL', 300))
@@ -3,6 +3,7 @@ import os
 from logging import getLogger
 
 from celery.schedules import crontab
+from kombu import Queue
 
 
 logger = getLogger('django')
@@ -20,7 +21,11 @@ CELERY_ENABLE_UTC = True
 CELERY_TIMEZONE = "UTC"
 
 CELERY_TASK_CREATE_MISSING_QUEUES = True
-CELERY_WORKER_PREFETCH_MULTIPLIER = 15
+# Workers reserve one message per process at a time so that the priorities of
+# the dedicated queues are applied to every task (see `Queues`).
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(
+    os.environ.get('CELERY_WORKER_PREFETCH_MULTIPLIER', 1)
+)
 CELERY_BROKER_CONNECTION_TIMEOUT= 10.0
 
 CELERY_TASK_SERIALIZER = 'msgpack'
@@ -31,6 +36,67 @@ project_id = os.environ.get('CELERY_ID', 'local')
 default_queue = '-'.join(('general', project_id))
 CELERY_TASK_DEFAULT_QUEUE = default_queue
 
+# Queues
+# Tasks are routed to dedicated queues so that slow document uploads do not
+# delay webhooks and check evaluation. Each queue is consumed by its own worker
+# deployment with its own prefetch multiplier (see `etc/`). Tasks in the
+# dedicated queues are prioritised from 0 to 9 (highest first). Priorities only
+# apply to messages that have not been prefetched, so the dedicated workers use
+# a prefetch multiplier of 1.
+webhooks_queue = '-'.join(('webhooks', project_id))
+checks_queue = '-'.join(('checks', project_id))
+uploads_queue = '-'.join(('uploads', project_id))
+
+CELERY_TASK_QUEUES = (
+    Queue(default_queue),
+    Queue(webhooks_queue, queue_arguments={'x-max-priority': 9}),
+    Queue(checks_queue, queue_arguments={'x-max-priority': 9}),
+    Queue(uploads_queue, queue_arguments={'x-max-priority': 9}),
+)
+
+CELERY_TASK_ROUTES = {
+    # Onfido webhooks carry check results so they go first.
+    'service_onfido.tasks.process_onfido_webhook': {
+        'queue': webhooks_queue, 'priority': 9,
+    },
+    'service_onfido.tasks.process_platform_webhook': {
+        'queue': webhooks_queue, 'priority': 6,
+    },
+    'service_onfido.tasks.drain_webhooks': {
+        'queue': webhooks_queue, 'priority': 0,
+    },
+    'service_onfido.tasks.dispatch_tenant_tasks': {
+        'queue': checks_queue, 'priority': 0,
+    },
+    'service_onfido.tasks.relay_outbox': {
+        'queue': checks_queue, 'priority': 0,
+    },
+    'service_onfido.tasks.sweep_stale_resources': {
+        'queue': checks_queue, 'priority': 0,
+    },
+    'service_onfido.tasks.purge_response_cache': {
+        'queue': checks_queue, 'priority': 0,
+    },
+    'service_onfido.tasks.evaluate_check': {
+        'queue': checks_queue, 'priority': 9,
+    },
+    'service_onfido.tasks.generate_check': {
+        'queue': checks_queue, 'priority': 6,
+    },
+    'service_onfido.tasks.generate_document': {
+        'queue': uploads_queue, 'priority': 6,
+    },
+    'service_onfido.tasks.pipeline_generate_checks': {
+        'queue': checks_queue, 'priority': 6,
+    },
+    'service_onfido.tasks.pipeline_generate_documents': {
+        'queue': uploads_queue, 'priority': 6,
+    },
+    'service_onfido.tasks.provision_applicants': {
+        'queue': uploads_queue, 'priority': 0,
+    },
+}
+
 # RabbitMQ
 CELERY_BROKER_URL = 'amqp://{user}:{password}@{hostname}/{vhost}'.format(
     user=os.environ.get('RABBITMQ_USER', 'guest'),
@@ -43,6 +109,122 @@ CELERY_BROKER_URL = 'amqp://{user}:{password}@{hostname}/{vhost}'.format(
 
 CELERY_IGNORE_RESULT = True
 
-CELERY_BEAT_SCHEDULE = {
+# Webhook ingestion
+# Webhook inserts (and the resulting task messages) from concurrent requests
+# in the same process can be micro-batched by waiting up to
+# `WEBHOOK_BATCH_WAIT` seconds for up to `WEBHOOK_BATCH_SIZE` webhooks. This is
+# only useful with threaded workers and is disabled by default.
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 100))
+WEBHOOK_BATCH_WAIT = float(os.environ.get('WEBHOOK_BATCH_WAIT', 0))
+WEBHOOK_BATCH_TIMEOUT = float(os.environ.get('WEBHOOK_BATCH_TIMEOUT', 10))
+
+# Onfido webhooks evaluate completed checks in the webhook task (outside of
+# any transaction) so that the outcome is recorded on the webhook with a single
+# retry policy. Set `WEBHOOK_EVALUATE_CHECKS` to false to evaluate them in a
+# separate task.
+WEBHOOK_EVALUATE_CHECKS = os.environ.get(
+    'WEBHOOK_EVALUATE_CHECKS', 'True'
+) in ['True', 'true', True]
+
+# Webhook drainer
+# Pending webhooks that have not been updated for `WEBHOOK_DRAIN_MIN_AGE`
+# seconds are assumed to have lost their processing task and are processed in
+# batches by the drainer. Webhooks are claimed before they are processed, and
+# claims that were not released after `WEBHOOK_CLAIM_LEASE` seconds (eg. because
+# the worker died) expire.
+WEBHOOK_DRAIN_BATCH_SIZE = int(os.environ.get('WEBHOOK_DRAIN_BATCH_SIZE', 100))
+WEBHOOK_DRAIN_MAX_BATCHES = int(os.environ.get('WEBHOOK_DRAIN_MAX_BATCHES', 10))
+WEBHOOK_DRAIN_MIN_AGE = int(os.environ.get('WEBHOOK_DRAIN_MIN_AGE', 600))
+WEBHOOK_CLAIM_LEASE = int(os.environ.get('WEBHOOK_CLAIM_LEASE', 600))
 
+# Reconciliation sweeper
+# Documents without an onfido resource and checks that are still processing
+# are re-submitted to the fair scheduler once they have not changed for
+# `SWEEP_MIN_AGE` seconds. Rows older than `SWEEP_MAX_AGE` seconds are ignored.
+# At most `SWEEP_LIMIT` rows of each type are re-submitted per run, rows that
+# were never swept first. A row is swept again after `SWEEP_MIN_AGE` seconds,
+# doubled for every previous sweep (up to `SWEEP_MAX_AGE`). Pending
+# checks at the head of a user's queue are re-submitted the same way, and
+# checks that were claimed more than `CHECK_CLAIM_LEASE` seconds ago but never
+# got an onfido check are released so that they can be claimed again.
+SWEEP_MIN_AGE = int(os.environ.get('SWEEP_MIN_AGE', 1800))
+SWEEP_MAX_AGE = int(os.environ.get('SWEEP_MAX_AGE', 604800))
+SWEEP_LIMIT = int(os.environ.get('SWEEP_LIMIT', 500))
+CHECK_CLAIM_LEASE = int(os.environ.get('CHECK_CLAIM_LEASE', 1800))
+
+# Task retries
+# Failed tasks are retried with exponential backoff and full jitter, starting
+# at `RETRY_BACKOFF` seconds and capped at `RETRY_BACKOFF_MAX` seconds. Each
+# company may retry `RETRY_BUDGET_RATE` tasks per second (with bursts of up to
+# `RETRY_BUDGET_BURST`). Tasks that exceed the budget are left to the drainer
+# and the reconciliation sweeper. Set the rate to 0 to disable the budget.
+RETRY_BACKOFF = float(os.environ.get('RETRY_BACKOFF', 10))
+RETRY_BACKOFF_MAX = float(os.environ.get('RETRY_BACKOFF_MAX', 600))
+RETRY_BUDGET_RATE = float(os.environ.get('RETRY_BUDGET_RATE', 1))
+RETRY_BUDGET_BURST = float(os.environ.get('RETRY_BUDGET_BURST', 60))
+
+# Fair scheduling
+# Documents and checks are dispatched in round-robin order across companies
+# with at most `FAIR_MAX_IN_FLIGHT` tasks of each type in flight per company.
+# Up to `FAIR_DISPATCH_BATCH_SIZE` tasks are published per dispatch. Tasks that
+# are in flight for longer than `FAIR_LEASE` seconds are dispatched again.
+FAIR_MAX_IN_FLIGHT = int(os.environ.get('FAIR_MAX_IN_FLIGHT', 10))
+FAIR_DISPATCH_BATCH_SIZE = int(os.environ.get('FAIR_DISPATCH_BATCH_SIZE', 100))
+FAIR_LEASE = int(os.environ.get('FAIR_LEASE', 3600))
+
+# Transactional outbox
+# Tasks enqueued inside a transaction are stored in the outbox and published in
+# batches of `OUTBOX_BATCH_SIZE` (at most `OUTBOX_RELAY_MAX_BATCHES` per relay)
+# once it has committed. Messages that are still waiting after
+# `OUTBOX_RELAY_MIN_AGE` seconds are published by the periodic relay.
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_RELAY_MAX_BATCHES = int(os.environ.get('OUTBOX_RELAY_MAX_BATCHES', 10))
+OUTBOX_RELAY_MIN_AGE = int(os.environ.get('OUTBOX_RELAY_MIN_AGE', 30))
+
+# Applicant provisioning
+# Applicants are provisioned for all the users of a company a page of
+# `PROVISIONING_PAGE_SIZE` Rehive users at a time, using the async pipeline
+# concurrency limits. Each provisioning task processes up to
+# `PROVISIONING_TASK_PAGES` pages before continuing in a new task.
+PROVISIONING_PAGE_SIZE = int(os.environ.get('PROVISIONING_PAGE_SIZE', 100))
+PROVISIONING_TASK_PAGES = int(os.environ.get('PROVISIONING_TASK_PAGES', 50))
+
+# Async pipeline
+# If `ASYNC_PIPELINE` is enabled, the documents and checks in each dispatch are
+# generated by a single task that runs up to `PIPELINE_CONCURRENCY` of them
+# concurrently (at most `PIPELINE_COMPANY_CONCURRENCY` per company) instead of
+# one task per object. Raise `FAIR_MAX_IN_FLIGHT` and `FAIR_DISPATCH_BATCH_SIZE`
+# to match, the client pools are sized to the concurrency. Each concurrent call
+# runs on its own thread with its own database connections (for the duration
+# of a run), so keep `PIPELINE_CONCURRENCY` within the database connection
+# budget of a worker. The synchronous tasks are used otherwise and for retries.
+ASYNC_PIPELINE = os.environ.get(
+    'ASYNC_PIPELINE', 'False'
+) in ['True', 'true', True]
+PIPELINE_CONCURRENCY = int(os.environ.get('PIPELINE_CONCURRENCY', 20))
+PIPELINE_COMPANY_CONCURRENCY = int(
+    os.environ.get('PIPELINE_COMPANY_CONCURRENCY', 10)
+)
+
+CELERY_BEAT_SCHEDULE = {
+    'drain-webhooks': {
+        'task': 'service_onfido.tasks.drain_webhooks',
+        'schedule': timedelta(minutes=1),
+    },
+    'dispatch-tenant-tasks': {
+        'task': 'service_onfido.tasks.dispatch_tenant_tasks',
+        'schedule': timedelta(minutes=1),
+    },
+    'relay-outbox': {
+        'task': 'service_onfido.tasks.relay_outbox',
+        'schedule': timedelta(minutes=1),
+    },
+    'sweep-stale-resources': {
+        'task': 'service_onfido.tasks.sweep_stale_resources',
+        'schedule': timedelta(minutes=15),
+    },
+    'purge-response-cache': {
+        'task': 'service_onfido.tasks.purge_response_cache',
+        'schedule': timedelta(hours=1),
+    },
 }
@@ -18,6 +18,9 @@ from .plugins.rest_framework import *
 from .plugins.spectacular import *
 from .plugins.database import *
 from .plugins.tasks import *
+from .plugins.cache import *
+from .plugins.clients import *
+from .plugins.stats import *
 from .plugins.sentry import *
 from .plugins.urls import *
 from .plugins.gcloud_bucket import *
@@ -135,6 +138,18 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(PROJECT_DIR, 'var/www/media')
 
+# Documents
+# ------------------------------------------------------------------------------
+# Document files are streamed from Rehive in `DOCUMENT_CHUNK_SIZE` chunks. Up to
+# `DOCUMENT_SPOOL_SIZE` bytes are kept in memory before the file is moved into a
+# temporary file. Files larger than `DOCUMENT_MAX_SIZE` are rejected.
+DOCUMENT_MAX_SIZE = int(os.environ.get('DOCUMENT_MAX_SIZE', 20971520))
+DOCUMENT_SPOOL_SIZE = int(os.environ.get('DOCUMENT_SPOOL_SIZE', 1048576))
+DOCUMENT_CHUNK_SIZE = int(os.environ.get('DOCUMENT_CHUNK_SIZE', 65536))
+# Max number of documents that are updated on Rehive concurrently when a check
+# is evaluated. Keep this at or below `REHIVE_POOL_SIZE`.
+DOCUMENT_UPDATE_WORKERS = int(os.environ.get('DOCUMENT_UPDATE_WORKERS', 8))
+
 # Template files
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/howto/static-files/
@@ -1,12 +1,42 @@
+import copy
 import uuid
+import hashlib
 
 from rest_framework.settings import api_settings
 from django.utils.translation import gettext_lazy as _
 from django.utils.encoding import smart_str
 from rest_framework import authentication, exceptions, status
-from rehive import Rehive, APIException
+from rehive import APIException
 
+from config import settings
 from .models import Company, User
+from .utils.cache import TTLCache
+from .utils.clients import rehive_clients
+
+
+# Process-local cache of resolved tokens. Maps a token hash to the platform
+# user and the IDs of the company and service user that the token resolved to.
+# Model instances are not cached so that every request gets fresh copies.
+token_cache = TTLCache(
+    maxsize=getattr(settings, 'AUTH_CACHE_MAX_SIZE'),
+    ttl=getattr(settings, 'AUTH_CACHE_TTL')
+)
+
+
+def get_token_cache_key(token):
+    """
+    Hash the token so that raw tokens are never kept in memory as keys.
+    """
+
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def invalidate_company_tokens(company):
+    """
+    Remove all cached tokens that resolved to the company.
+    """
+
+    return token_cache.invalidate(lambda value: value[1] == company.id)
 
 
 class AuthenticationAPIException(exceptions.APIException):
@@ -130,11 +160,30 @@ class RehiveAuthentication(HeaderAuthentication):
     def authenticate(self, request):
         ips = self._get_request_ips(request)
         token = self.get_auth_header(request)
-        rehive = Rehive(token)
 
         if not token:
             raise exceptions.NotAuthenticated()
 
+        # Use the cached resolution of the token if it exists.
+        cache_key = get_token_cache_key(token)
+        cached = token_cache.get(cache_key) if token_cache.ttl else None
+        if cached:
+            platform_user, company_id, user_id = cached
+
+            # The company is checked on every request so that deactivations
+            # in other processes take effect immediately.
+            try:
+                user = User.objects.select_related('company').get(
+                    id=user_id, company_id=company_id, company__active=True
+                )
+            except User.DoesNotExist:
+                token_cache.invalidate(lambda value: value[1] == company_id)
+            else:
+                user._platform_user = copy.deepcopy(platform_user)
+                return user, token
+
+        rehive = rehive_clients.get(token)
+
         try:
             platform_user = rehive.auth.get(
                 headers={"X-Forwarded-For": ", ".join(ips)}
@@ -159,6 +208,14 @@ class RehiveAuthentication(HeaderAuthentication):
 
         # Inject the platform user object into the auth user.
         user._platform_user = platform_user
+        # Populate the company so that it does not need to be refetched.
+        user.company = company
+
+        if token_cache.ttl:
+            token_cache.set(
+                cache_key,
+                (copy.deepcopy(platform_user), company.id, user.id,)
+            )
 
         return user, token
 
@@ -0,0 +1,221 @@
+import time
+import threading
+from logging import getLogger
+
+import requests
+
+from config import settings
+from service_onfido.exceptions import CircuitOpenError
+from service_onfido.reporters import stats_reporter
+from service_onfido.utils.sessions import SessionWrapper
+
+
+logger = getLogger('django')
+
+
+class CircuitBreaker:
+    """
+    Process-local circuit breaker for an upstream.
+
+    The circuit opens after `failure_threshold` consecutive failures and then
+    rejects calls for `recovery_timeout` seconds. After that the circuit is
+    half-open and lets up to `half_open_calls` trial calls through at a time.
+    A successful trial closes the circuit and a failed trial opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30,
+            half_open_calls=1, timer=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self.timer = timer
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trials = 0
+        self.rejected = 0
+        self.transitions = {
+            self.CLOSED: 0, self.OPEN: 0, self.HALF_OPEN: 0,
+        }
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        logger.warning("Circuit {} changed from {} to {}.".format(
+            self.name, self.state, state
+        ))
+        self.state = state
+        self.transitions[state] += 1
+
+        if state == self.OPEN:
+            self.opened_at = self.timer()
+        elif state == self.CLOSED:
+            self.failures = 0
+
+    def before_call(self):
+        """
+        Check whether a call is allowed. Raises `CircuitOpenError` if it is
+        not.
+        """
+
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = (
+                    self.opened_at + self.recovery_timeout - self.timer()
+                )
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(
+                        "The {} circuit is open.".format(self.name),
+                        retry_after=remaining
+                    )
+                self._transition(self.HALF_OPEN)
+                self.trials = 0
+
+            if self.state == self.HALF_OPEN:
+                if self.trials >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(
+                        "The {} circuit is half-open.".format(self.name),
+                        retry_after=self.recovery_timeout
+                    )
+                self.trials += 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.trials = max(self.trials - 1, 0)
+                self._transition(self.CLOSED)
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+            if self.state == self.HALF_OPEN:
+                self.trials = max(self.trials - 1, 0)
+                self._transition(self.OPEN)
+            elif (self.state == self.CLOSED
+                    and self.failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+
+    def cancel(self):
+        """
+        Release a call that did not reach the upstream.
+        """
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.trials = max(self.trials - 1, 0)
+
+    @property
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
+
+
+class CircuitBreakerRegistry:
+    """
+    Process-local registry of circuit breakers keyed by upstream and region.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30,
+            half_open_calls=1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, upstream, region=None):
+        """
+        Get the breaker for an upstream and region, creating it if necessary.
+        """
+
+        name = ":".join(str(p) for p in (upstream, region,) if p)
+
+        with self._lock:
+            try:
+                return self._breakers[name]
+            except KeyError:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=self.failure_threshold,
+                    recovery_timeout=self.recovery_timeout,
+                    half_open_calls=self.half_open_calls
+                )
+                self._breakers[name] = breaker
+                return breaker
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                name: breaker.stats
+                for name, breaker in self._breakers.items()
+            }
+
+
+class CircuitBreakerSession(SessionWrapper):
+    """
+    Wrapper around a requests session that fast-fails requests while the
+    circuit of the upstream is open.
+
+    Connection errors, timeouts and server errors count as failures. Other
+    responses (including client errors) count as successes.
+    """
+
+    def __init__(self, session, breaker):
+        super().__init__(session)
+        self.breaker = breaker
+
+    def request(self, method, url, **kwargs):
+        self.breaker.before_call()
+
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout,):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Not an upstream failure (eg. a rate limit).
+            self.breaker.cancel()
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        return response
+
+
+def get_circuit_error(exc):
+    """
+    Get the `CircuitOpenError` that caused an exception (if any).
+    """
+
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, CircuitOpenError):
+            return exc
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+
+    return None
+
+
+circuit_breakers = CircuitBreakerRegistry(
+    failure_threshold=getattr(settings, 'CIRCUIT_FAILURE_THRESHOLD'),
+    recovery_timeout=getattr(settings, 'CIRCUIT_RECOVERY_TIMEOUT'),
+    half_open_calls=getattr(settings, 'CIRCUIT_HALF_OPEN_CALLS')
+)
+stats_reporter.register("circuit_breakers", circuit_breakers)
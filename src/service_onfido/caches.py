@@ -0,0 +1,210 @@
+import json
+import threading
+from datetime import timedelta
+from logging import getLogger
+
+from django.core.cache import caches
+from django.utils.timezone import now
+
+from config import settings
+from service_onfido.reporters import stats_reporter
+
+
+logger = getLogger('django')
+
+
+class DatabaseResponseBackend:
+    """
+    Store Onfido responses in the `OnfidoResponse` table.
+    """
+
+    def get(self, company_id, resource, resource_id):
+        from service_onfido.models import OnfidoResponse
+
+        row = OnfidoResponse.objects.filter(
+            company_id=company_id,
+            resource=resource,
+            resource_id=resource_id
+        ).values_list('data', 'size', 'expires').first()
+
+        if row is None or (row[2] and row[2] <= now()):
+            return None
+
+        return row[0], row[1]
+
+    def set(self, company_id, resource, resource_id, data, size, ttl=None):
+        from service_onfido.models import OnfidoResponse
+
+        OnfidoResponse.objects.bulk_create(
+            [
+                OnfidoResponse(
+                    company_id=company_id,
+                    resource=resource,
+                    resource_id=resource_id,
+                    data=data,
+                    size=size,
+                    expires=now() + timedelta(seconds=ttl) if ttl else None
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=['company', 'resource', 'resource_id'],
+            update_fields=['data', 'size', 'expires', 'updated']
+        )
+
+    def purge(self, batch_size=1000):
+        """
+        Delete expired responses in batches. Returns the number of deleted
+        responses.
+        """
+
+        from service_onfido.models import OnfidoResponse
+
+        deleted = 0
+        while True:
+            ids = list(
+                OnfidoResponse.objects.filter(
+                    expires__lte=now()
+                ).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            deleted += OnfidoResponse.objects.filter(id__in=ids).delete()[0]
+
+        return deleted
+
+
+class DjangoResponseBackend:
+    """
+    Store Onfido responses in a configured Django cache.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def _get_key(self, company_id, resource, resource_id):
+        return "onfido:{}:{}:{}".format(company_id, resource, resource_id)
+
+    def get(self, company_id, resource, resource_id):
+        return caches[self.alias].get(
+            self._get_key(company_id, resource, resource_id)
+        )
+
+    def set(self, company_id, resource, resource_id, data, size, ttl=None):
+        caches[self.alias].set(
+            self._get_key(company_id, resource, resource_id),
+            (data, size,),
+            timeout=ttl or None
+        )
+
+    def purge(self, batch_size=1000):
+        # The cache expires entries itself.
+        return 0
+
+
+class ResponseCache:
+    """
+    Shared cache of Onfido API responses keyed by company and resource.
+
+    Final responses (eg. completed checks) are cached indefinitely and all
+    other responses are cached for `ttl` seconds. Cache errors are logged and
+    treated as misses so that Onfido remains the source of truth.
+    """
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, company_id, resource, resource_id, fetch,
+            final=None):
+        """
+        Get a cached response or fetch it and add it to the cache.
+
+        fetch: Callable that fetches the response from Onfido
+        final: Callable that checks whether a response will not change anymore
+        """
+
+        try:
+            cached = self.backend.get(company_id, resource, resource_id)
+        except Exception as exc:
+            logger.exception(exc)
+            cached = None
+
+        if cached is not None:
+            data, size = cached
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += size
+            return data
+
+        with self._lock:
+            self.misses += 1
+
+        data = fetch()
+
+        if final and final(data):
+            ttl = None
+        elif self.ttl:
+            ttl = self.ttl
+        else:
+            return data
+
+        try:
+            self.backend.set(
+                company_id,
+                resource,
+                resource_id,
+                data,
+                len(json.dumps(data, default=str)),
+                ttl=ttl
+            )
+        except Exception as exc:
+            logger.exception(exc)
+
+        return data
+
+    def purge(self):
+        """
+        Delete expired responses from the backend. Returns the number of
+        deleted responses.
+        """
+
+        try:
+            return self.backend.purge()
+        except Exception as exc:
+            logger.exception(exc)
+            return 0
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+def get_response_backend(name):
+    """
+    Get a response cache backend. `database` uses the `OnfidoResponse` table
+    and any other name is used as a Django cache alias.
+    """
+
+    if name == "database":
+        return DatabaseResponseBackend()
+
+    return DjangoResponseBackend(name)
+
+
+response_cache = ResponseCache(
+    get_response_backend(getattr(settings, 'ONFIDO_RESPONSE_CACHE')),
+    ttl=getattr(settings, 'ONFIDO_RESPONSE_CACHE_TTL')
+)
+stats_reporter.register("response_cache", response_cache)
@@ -35,6 +35,13 @@ class CheckStatus(Enum):
     FAILED = 'failed'
 
 
+class ProvisioningStatus(Enum):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+
+
 class PlatformDocumentStatus(Enum):
     OBSOLETE = 'obsolete'
     DECLINED = 'declined'
@@ -14,6 +14,15 @@ class OnfidoError(OnfidoException):
     default_error_slug = 'onfido_error'
 
 
+class PermanentError:
+    """
+    Mixin for errors caused by invalid data or configuration. They fail the
+    same way every time, so they are not retried.
+    """
+
+    pass
+
+
 class PlatformWebhookProcessingError(OnfidoError):
     default_detail = 'Platform webhook processing error.'
     default_error_slug = 'platform_webhook_processing_error.'
@@ -29,11 +38,43 @@ class UserProcessingError(OnfidoException):
     default_error_slug = 'user_processing_error.'
 
 
+class InvalidUserError(PermanentError, UserProcessingError):
+    pass
+
+
 class DocumentProcessingError(OnfidoException):
     default_detail = 'Document processing error.'
     default_error_slug = 'document_processing_error.'
 
 
+class InvalidDocumentError(PermanentError, DocumentProcessingError):
+    pass
+
+
 class CheckProcessingError(OnfidoException):
     default_detail = 'Check processing error.'
     default_error_slug = 'check_processing_error.'
+
+
+class InvalidCheckError(PermanentError, CheckProcessingError):
+    pass
+
+
+class ProvisioningError(OnfidoException):
+    default_detail = 'Provisioning error.'
+    default_error_slug = 'provisioning_error.'
+
+
+class RateLimitError(OnfidoException):
+    default_detail = 'Rate limit exceeded.'
+    default_error_slug = 'rate_limit_error.'
+
+
+class CircuitOpenError(OnfidoException):
+    default_detail = 'Upstream circuit is open.'
+    default_error_slug = 'circuit_open_error.'
+
+    def __init__(self, detail=None, error_slug=None, retry_after=None):
+        super().__init__(detail, error_slug)
+        # Number of seconds until the circuit allows trial requests.
+        self.retry_after = retry_after
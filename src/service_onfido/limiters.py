@@ -0,0 +1,285 @@
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from logging import getLogger
+
+from django.db import transaction, IntegrityError
+from django.db.models.functions import Now
+from django.utils.timezone import now
+
+from config import settings
+from service_onfido.exceptions import RateLimitError
+from service_onfido.utils.sessions import SessionWrapper
+
+
+logger = getLogger('django')
+
+
+def get_retry_after(response):
+    """
+    Get the number of seconds to wait from the `Retry-After` header of a
+    response. Returns None if the header is missing or invalid.
+    """
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        return max((parsedate_to_datetime(value) - now()).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class DatabaseBucketBackend:
+    """
+    Store token buckets in the `RateLimitBucket` table.
+
+    Buckets are updated in short transactions on the `using` database alias,
+    and the database clock is used so that all nodes agree on the time.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    def _get_bucket(self, company_id, upstream, capacity):
+        from service_onfido.models import RateLimitBucket
+
+        queryset = RateLimitBucket.objects.using(self.using).annotate(
+            now=Now()
+        ).select_for_update(of=('self',))
+
+        try:
+            return queryset.get(company_id=company_id, upstream=upstream)
+        except RateLimitBucket.DoesNotExist:
+            pass
+
+        try:
+            with transaction.atomic(using=self.using):
+                RateLimitBucket.objects.using(self.using).create(
+                    company_id=company_id,
+                    upstream=upstream,
+                    tokens=capacity,
+                    refilled=now()
+                )
+        except IntegrityError:
+            pass
+
+        return queryset.get(company_id=company_id, upstream=upstream)
+
+    def acquire(self, company_id, upstream, rate, capacity):
+        """
+        Take a token from a bucket. Returns 0 if a token was taken, otherwise
+        the number of seconds to wait before trying again.
+        """
+
+        with transaction.atomic(using=self.using):
+            bucket = self._get_bucket(company_id, upstream, capacity)
+
+            if bucket.blocked_until and bucket.blocked_until > bucket.now:
+                return (bucket.blocked_until - bucket.now).total_seconds()
+
+            elapsed = max((bucket.now - bucket.refilled).total_seconds(), 0)
+            bucket.tokens = min(capacity, bucket.tokens + elapsed * rate)
+            bucket.refilled = bucket.now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - bucket.tokens) / rate
+
+            bucket.save(
+                using=self.using, update_fields=['tokens', 'refilled']
+            )
+
+        return wait
+
+    def block(self, company_id, upstream, seconds):
+        """
+        Stop a bucket from handing out tokens for a number of seconds.
+        """
+
+        from service_onfido.models import RateLimitBucket
+
+        RateLimitBucket.objects.using(self.using).filter(
+            company_id=company_id, upstream=upstream
+        ).update(tokens=0, blocked_until=Now() + timedelta(seconds=seconds))
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter shared by all workers.
+
+    Each (company, upstream) pair has its own bucket. Callers wait for a token
+    for up to `max_wait` seconds and a `RateLimitError` is raised after that.
+    Limiter errors are logged and the call is allowed so that an unavailable
+    backend does not stop outbound calls.
+    """
+
+    def __init__(self, backend, rates, max_wait=30):
+        self.backend = backend
+        # Mapping of upstream names to (rate, capacity).
+        self.rates = rates
+        self.max_wait = max_wait
+        self.acquired = 0
+        self.waited = 0.0
+        self.blocked = 0
+        # Tokens taken up front for requests made from other threads.
+        self._prepaid = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def acquire(self, company_id, upstream, max_wait=None):
+        """
+        Wait for a token from the bucket of a company and upstream.
+
+        max_wait: Override the max number of seconds to wait for a token
+        """
+
+        rate, capacity = self.rates.get(upstream, (0, 0,))
+        if not rate or company_id is None:
+            return
+
+        with self._lock:
+            if self._prepaid[(company_id, upstream,)] > 0:
+                self._prepaid[(company_id, upstream,)] -= 1
+                return
+
+        if max_wait is None:
+            max_wait = self.max_wait
+
+        waited = 0.0
+        while True:
+            try:
+                wait = self.backend.acquire(
+                    company_id, upstream, rate, capacity
+                )
+            except Exception as exc:
+                logger.exception(exc)
+                return
+
+            if not wait:
+                break
+
+            if waited + wait > max_wait:
+                raise RateLimitError(
+                    "Rate limit exceeded for {}.".format(upstream)
+                )
+
+            time.sleep(wait)
+            waited += wait
+
+        with self._lock:
+            self.acquired += 1
+            self.waited += waited
+
+    @contextmanager
+    def prepaid(self, company_id, upstream, count):
+        """
+        Take `count` tokens from the bucket of a company and upstream up front.
+
+        Requests made within the context use these tokens instead of taking
+        their own, so requests made from a thread pool do not need database
+        connections of their own. Unused tokens are dropped on exit.
+        """
+
+        for _ in range(count):
+            self.acquire(company_id, upstream)
+
+        key = (company_id, upstream,)
+        with self._lock:
+            self._prepaid[key] += count
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._prepaid[key] -= min(self._prepaid[key], count)
+                if not self._prepaid[key]:
+                    del self._prepaid[key]
+
+    def block(self, company_id, upstream, seconds):
+        """
+        Feed a `Retry-After` delay back into the bucket of a company and
+        upstream.
+        """
+
+        if company_id is None or upstream not in self.rates:
+            return
+
+        try:
+            self.backend.block(company_id, upstream, seconds)
+        except Exception as exc:
+            logger.exception(exc)
+            return
+
+        with self._lock:
+            self.blocked += 1
+
+    @property
+    def stats(self):
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "blocked": self.blocked,
+        }
+
+
+class RateLimitedSession(SessionWrapper):
+    """
+    Wrapper around a shared requests session that takes a token before every
+    request and feeds throttled responses back into the bucket.
+    """
+
+    def __init__(self, session, limiter, company_id, upstream):
+        super().__init__(session)
+        self.limiter = limiter
+        self.company_id = company_id
+        self.upstream = upstream
+
+    def request(self, method, url, **kwargs):
+        self.limiter.acquire(self.company_id, self.upstream)
+
+        response = self.session.request(method, url, **kwargs)
+
+        if response.status_code == 429:
+            retry_after = get_retry_after(response)
+            logger.warning("Throttled by {} for company {}.".format(
+                self.upstream, self.company_id
+            ))
+            self.limiter.block(
+                self.company_id,
+                self.upstream,
+                retry_after if retry_after is not None else 1
+            )
+
+        return response
+
+
+rate_limiter = RateLimiter(
+    DatabaseBucketBackend(using=getattr(settings, 'RATE_LIMIT_DATABASE')),
+    rates={
+        "onfido": (
+            getattr(settings, 'ONFIDO_RATE'),
+            getattr(settings, 'ONFIDO_BURST'),
+        ),
+        "rehive": (
+            getattr(settings, 'REHIVE_RATE'),
+            getattr(settings, 'REHIVE_BURST'),
+        ),
+        # Task retries are budgeted per company (see `retries.RetryPolicy`).
+        "retries": (
+            getattr(settings, 'RETRY_BUDGET_RATE'),
+            getattr(settings, 'RETRY_BUDGET_BURST'),
+        ),
+    },
+    max_wait=getattr(settings, 'RATE_LIMIT_MAX_WAIT')
+)
@@ -0,0 +1,221 @@
+import json
+import time
+import uuid
+import threading
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.db import transaction, connection
+from django.core.management.base import BaseCommand
+
+from service_onfido.models import (
+    Company, User, DocumentType, Document, Check
+)
+from service_onfido.enums import CheckStatus, OnfidoDocumentType
+from service_onfido.utils.clients import OnfidoClient, create_session
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the Onfido check and Rehive document endpoints. Every
+    response is delayed by the server `latency`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def respond(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        if remaining:
+            self.rfile.read(remaining)
+
+        time.sleep(self.server.latency)
+
+        body = json.dumps({
+            "id": "benchmark",
+            "status": "complete",
+            "reports": [
+                {
+                    "name": "document",
+                    "status": "complete",
+                    "sub_result": "clear"
+                }
+            ]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = respond
+    do_POST = respond
+    do_PATCH = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class LockProbe(threading.Thread):
+    """
+    Repeatedly acquire a user row lock and record the longest wait.
+    """
+
+    def __init__(self, user_id):
+        super().__init__(daemon=True)
+        self.user_id = user_id
+        self.max_wait = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                start = time.perf_counter()
+                with transaction.atomic():
+                    User.objects.select_for_update().get(id=self.user_id)
+                self.max_wait = max(
+                    self.max_wait, time.perf_counter() - start
+                )
+                time.sleep(0.001)
+        finally:
+            connection.close()
+
+
+def locked(user, func):
+    """
+    Run a check flow the way it used to run: inside a transaction that holds
+    the user row lock for the whole flow, including the remote requests.
+    """
+
+    with transaction.atomic():
+        User.objects.select_for_update().get(id=user.id)
+        func()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how long the user row lock is held while checks are "
+        "generated and evaluated against a local stand-in server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--latency', type=float, default=0.2,
+            help='Stand-in response latency in seconds.'
+        )
+        parser.add_argument(
+            '--documents', type=int, default=3,
+            help='Number of documents per check.'
+        )
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help='Number of runs per mode.'
+        )
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        server.latency = options["latency"]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:{}/".format(server.server_port)
+        session = create_session(10)
+        client = OnfidoClient("benchmark", url, session)
+
+        def update_platform_resource(document, data):
+            session.patch(
+                url + "documents/" + document.platform_id, json=data
+            ).raise_for_status()
+
+        admin = User.objects.create()
+        company = Company.objects.create(
+            identifier="benchmark-{}".format(uuid.uuid4().hex),
+            admin=admin,
+            onfido_api_key="benchmark",
+            onfido_webhook_id="benchmark",
+            onfido_webhook_token="benchmark"
+        )
+        user = User.objects.create(company=company)
+        document_type = DocumentType.objects.create(
+            company=company,
+            platform_type="benchmark",
+            onfido_type=OnfidoDocumentType.PASSPORT
+        )
+        # Created in bulk so that no tasks are triggered.
+        documents = Document.objects.bulk_create([
+            Document(
+                user=user,
+                type=document_type,
+                platform_id="benchmark-{}".format(i)
+            )
+            for i in range(options["documents"])
+        ])
+        check = Check.objects.bulk_create([
+            Check(user=user, status=CheckStatus.PENDING)
+        ])[0]
+        check.documents.set(documents)
+
+        self.stdout.write("{:>8} {:>10} {:>12} {:>16}".format(
+            "mode", "flow", "wall (s)", "max wait (s)"
+        ))
+
+        try:
+            with mock.patch.object(
+                        Company, "onfido_api", property(lambda c: client)
+                    ), mock.patch.object(
+                        Document,
+                        "update_platform_resource",
+                        update_platform_resource
+                    ), mock.patch("service_onfido.tasks.generate_check"):
+                for mode in ("locked", "phased",):
+                    for flow in ("generate", "evaluate",):
+                        elapsed = max_wait = 0
+
+                        for i in range(options["runs"]):
+                            # Reset the check for the flow.
+                            Check.objects.filter(id=check.id).update(
+                                status=(
+                                    CheckStatus.PENDING
+                                    if flow == "generate"
+                                    else CheckStatus.PROCESSING
+                                ),
+                                onfido_id=(
+                                    None if flow == "generate" else "benchmark"
+                                ),
+                                onfido_status=None,
+                                onfido_reports=None
+                            )
+                            instance = Check.objects.select_related(
+                                "user__company__admin"
+                            ).get(id=check.id)
+                            func = (
+                                instance.generate_onfido_resource
+                                if flow == "generate"
+                                else instance.evaluate
+                            )
+
+                            probe = LockProbe(user.id)
+                            probe.start()
+                            time.sleep(0.01)
+
+                            start = time.perf_counter()
+                            if mode == "locked":
+                                locked(user, func)
+                            else:
+                                func()
+                            elapsed += time.perf_counter() - start
+
+                            probe.stopped.set()
+                            probe.join()
+                            max_wait = max(max_wait, probe.max_wait)
+
+                        self.stdout.write(
+                            "{:>8} {:>10} {:>12.3f} {:>16.3f}".format(
+                                mode,
+                                flow,
+                                elapsed / options["runs"],
+                                max_wait
+                            )
+                        )
+        finally:
+            server.shutdown()
+            session.close()
+            check.delete()
+            admin.delete()
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import resource
+import tempfile
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import onfido
+from django.core.management.base import BaseCommand
+
+from service_onfido.utils.clients import OnfidoClient, create_session
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the Onfido document upload endpoint. Discards the body.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(remaining, 65536)))
+
+        body = json.dumps({"id": "benchmark"}).encode()
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def get_rss():
+    """
+    Get the current resident set size of the process in KB.
+    """
+
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+
+def run_upload(mode, url, path, queue):
+    """
+    Upload a file to the stand-in server and report the wall time and the
+    peak RSS growth. Runs in a separate process so that peaks are isolated.
+    """
+
+    if mode == "buffered":
+        api = onfido.Api("benchmark", region=url)
+    else:
+        api = OnfidoClient("benchmark", url, create_session(1))
+
+    baseline = get_rss()
+    start = time.perf_counter()
+    with open(path, "rb") as file:
+        api.document.upload(file, {"applicant_id": "x", "type": "passport"})
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    queue.put((elapsed, max(peak - baseline, 0)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the buffered Onfido SDK upload with the streaming multipart "
+        "upload against a local stand-in server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1, 10, 50],
+            help='Document sizes in MB.'
+        )
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:{}/".format(server.server_port)
+        context = multiprocessing.get_context("fork")
+
+        self.stdout.write("{:>8} {:>10} {:>12} {:>16}".format(
+            "size", "mode", "wall (s)", "peak RSS (MB)"
+        ))
+
+        try:
+            for size in options["sizes"]:
+                with tempfile.NamedTemporaryFile(suffix=".png") as file:
+                    chunk = os.urandom(1048576)
+                    for _ in range(size):
+                        file.write(chunk)
+                    file.flush()
+
+                    for mode in ("buffered", "streaming",):
+                        queue = context.Queue()
+                        process = context.Process(
+                            target=run_upload,
+                            args=(mode, url, file.name, queue,)
+                        )
+                        process.start()
+                        elapsed, peak = queue.get()
+                        process.join()
+
+                        self.stdout.write(
+                            "{:>6}MB {:>10} {:>12.3f} {:>16.1f}".format(
+                                size, mode, elapsed, peak / 1024
+                            )
+                        )
+        finally:
+            server.shutdown()
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from service_onfido.pipelines import AsyncPipeline
+from service_onfido.utils.clients import OnfidoClient, create_session
+from service_onfido.utils.files import download_file
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the Rehive file storage and the Onfido document and check
+    endpoints. Every response is delayed by the server `latency`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        self.send_body(self.server.file, "image/png")
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(remaining, 65536)))
+
+        time.sleep(self.server.latency)
+        self.send_body(
+            json.dumps({"id": "benchmark"}).encode(), "application/json"
+        )
+
+    def log_message(self, *args):
+        pass
+
+
+def process_document(url, client, session):
+    """
+    Download a document, upload it and create a check (the network calls made
+    by `Document.generate` and `Check.generate`).
+    """
+
+    with download_file(url + "file", session=session) as file:
+        document = client.document.upload(
+            file, {"applicant_id": "x", "type": "passport"}
+        )
+
+    return client.check.create({
+        "applicant_id": "x",
+        "document_ids": [document["id"]],
+        "report_names": ["document"],
+    })
+
+
+def run_prefork(url, count, queue):
+    """
+    Process documents one at a time, like a prefork worker process.
+    """
+
+    session = create_session(1)
+    client = OnfidoClient("benchmark", url, session)
+
+    for _ in range(count):
+        process_document(url, client, session)
+
+    queue.put(count)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the document throughput of prefork worker processes with "
+        "the async pipeline in a single process against local stand-in "
+        "servers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--documents', type=int, default=200,
+            help='Number of documents.'
+        )
+        parser.add_argument(
+            '--latency', type=float, default=0.05,
+            help='Stand-in server latency in seconds.'
+        )
+        parser.add_argument(
+            '--size', type=int, default=256,
+            help='Document size in KB.'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=4,
+            help='Number of prefork worker processes.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=100,
+            help='Pipeline concurrency.'
+        )
+        parser.add_argument(
+            '--companies', type=int, default=10,
+            help='Number of companies the documents are spread over.'
+        )
+        parser.add_argument(
+            '--company-concurrency', type=int, default=10,
+            help='Pipeline concurrency per company.'
+        )
+
+    def run_prefork(self, url, documents, processes):
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        counts = [
+            documents // processes + (1 if i < documents % processes else 0)
+            for i in range(processes)
+        ]
+
+        start = time.perf_counter()
+        workers = [
+            context.Process(target=run_prefork, args=(url, c, queue,))
+            for c in counts if c
+        ]
+        for worker in workers:
+            worker.start()
+        processed = sum(queue.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+
+        return processed, time.perf_counter() - start
+
+    def run_pipeline(self, url, documents, options):
+        pipeline = AsyncPipeline(
+            concurrency=options["concurrency"],
+            company_concurrency=options["company_concurrency"]
+        )
+        session = create_session(options["concurrency"])
+        client = OnfidoClient("benchmark", url, session)
+
+        start = time.perf_counter()
+        results = pipeline.run(
+            lambda i: process_document(url, client, session),
+            range(documents),
+            key=lambda i: i % options["companies"]
+        )
+        elapsed = time.perf_counter() - start
+
+        failed = [exc for item, result, exc in results if exc]
+        if failed:
+            self.stderr.write("{} documents failed: {}".format(
+                len(failed), failed[0]
+            ))
+
+        return len(results) - len(failed), elapsed
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        server.daemon_threads = True
+        server.request_queue_size = 1024
+        server.latency = options["latency"]
+        server.file = os.urandom(options["size"] * 1024)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:{}/".format(server.server_port)
+
+        documents = options["documents"]
+
+        self.stdout.write("{:>28} {:>10} {:>10} {:>12}".format(
+            "mode", "documents", "wall (s)", "docs/s"
+        ))
+
+        try:
+            runs = (
+                (
+                    "prefork ({} processes)".format(options["processes"]),
+                    lambda: self.run_prefork(
+                        url, documents, options["processes"]
+                    ),
+                ),
+                (
+                    "pipeline (1 process)",
+                    lambda: self.run_pipeline(url, documents, options),
+                ),
+            )
+            for name, run in runs:
+                processed, elapsed = run()
+                self.stdout.write("{:>28} {:>10} {:>10.2f} {:>12.1f}".format(
+                    name, processed, elapsed, processed / elapsed
+                ))
+        finally:
+            server.shutdown()
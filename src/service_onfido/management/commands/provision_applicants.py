@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service_onfido.models import Company, Provisioning
+from service_onfido.enums import ProvisioningStatus
+from service_onfido.exceptions import ProvisioningError
+
+
+class Command(BaseCommand):
+    help = (
+        "Provision Onfido applicants (and Rehive metadata) for every user of "
+        "a company. Progress is checkpointed after each page of users."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('company', help='Company identifier.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Resume a provisioning that is in progress (eg. after a '
+                 'crash) instead of starting a new one.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.select_related('admin').get(
+                identifier=options['company']
+            )
+        except Company.DoesNotExist:
+            raise CommandError("Company does not exist.")
+
+        provisioning = None
+        if options['resume']:
+            provisioning = Provisioning.objects.filter(
+                company=company,
+                status__in=(
+                    ProvisioningStatus.PENDING, ProvisioningStatus.PROCESSING,
+                )
+            ).order_by('-created').first()
+
+        if provisioning is None:
+            try:
+                provisioning = Provisioning.objects.start(company)
+            except ProvisioningError as exc:
+                raise CommandError(
+                    "{} Use --resume to continue it.".format(exc)
+                )
+
+        self.stdout.write("Provisioning {} from {} processed users.".format(
+            provisioning, provisioning.processed
+        ))
+
+        start = time.perf_counter()
+        initial = provisioning.processed
+
+        def report(p):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                "{} processed, {} provisioned, {} failed "
+                "({:.1f} users/s)".format(
+                    p.processed,
+                    p.provisioned,
+                    p.failed,
+                    (p.processed - initial) / elapsed if elapsed else 0.0
+                )
+            )
+
+        try:
+            completed = provisioning.run(callback=report)
+        except Exception:
+            self.stderr.write(
+                "Provisioning stopped, use --resume to continue it."
+            )
+            raise
+
+        if completed is None:
+            raise CommandError("The provisioning is already running.")
+
+        self.stdout.write("Provisioning complete.")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from service_onfido.schedulers import fair_scheduler
+
+
+class Command(BaseCommand):
+    help = "Show the fair scheduler backlog and wait time of each company."
+
+    def handle(self, *args, **options):
+        self.stdout.write("{:<36} {:<40} {:>8} {:>10} {:>10}".format(
+            "company", "task", "pending", "in flight", "wait (s)"
+        ))
+
+        for row in fair_scheduler.backlog():
+            self.stdout.write(
+                "{:<36} {:<40} {:>8} {:>10} {:>10.1f}".format(
+                    row["company"],
+                    row["task"],
+                    row["pending"],
+                    row["in_flight"],
+                    row["wait"]
+                )
+            )
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built without blocking writes to the tables.
+    atomic = False
+
+    dependencies = [
+        ("service_onfido", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="onfidowebhook",
+            index=models.Index(
+                condition=models.Q(
+                    ("completed__isnull", True), ("failed__isnull", True)
+                ),
+                fields=["updated"],
+                name="onfidowebhook_pending_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="platformwebhook",
+            index=models.Index(
+                condition=models.Q(
+                    ("completed__isnull", True), ("failed__isnull", True)
+                ),
+                fields=["updated"],
+                name="platformwebhook_pending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:50
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import service_onfido.enums
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built without blocking writes to the tables.
+    atomic = False
+
+    dependencies = [
+        ("service_onfido", "0002_webhook_pending_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="check",
+            index=models.Index(
+                condition=models.Q(
+                    ("status", service_onfido.enums.CheckStatus["PROCESSING"])
+                ),
+                fields=["updated", "id"],
+                name="check_processing_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="document",
+            index=models.Index(
+                condition=models.Q(("onfido_id__isnull", True)),
+                fields=["created", "id"],
+                name="document_no_onfido_id_idx",
+            ),
+        ),
+    ]
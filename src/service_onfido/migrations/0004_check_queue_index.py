@@ -0,0 +1,34 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:51
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import service_onfido.enums
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built without blocking writes to the tables.
+    atomic = False
+
+    dependencies = [
+        ("service_onfido", "0003_stale_resource_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="check",
+            index=models.Index(
+                condition=models.Q(
+                    (
+                        "status__in",
+                        (
+                            service_onfido.enums.CheckStatus["PROCESSING"],
+                            service_onfido.enums.CheckStatus["PENDING"],
+                        ),
+                    )
+                ),
+                fields=["user", "created"],
+                name="check_queue_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0004_check_queue_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="check",
+            name="onfido_reports",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="check",
+            name="onfido_status",
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
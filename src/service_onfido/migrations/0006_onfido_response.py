@@ -0,0 +1,45 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0005_check_onfido_results"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OnfidoResponse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("resource", models.CharField(max_length=64)),
+                ("resource_id", models.CharField(max_length=64)),
+                ("data", models.JSONField()),
+                ("size", models.IntegerField(default=0)),
+                ("expires", models.DateTimeField(blank=True, null=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="service_onfido.company",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("company", "resource", "resource_id")},
+            },
+        ),
+    ]
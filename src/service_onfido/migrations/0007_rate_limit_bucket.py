@@ -0,0 +1,42 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0006_onfido_response"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RateLimitBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("upstream", models.CharField(max_length=32)),
+                ("tokens", models.FloatField()),
+                ("refilled", models.DateTimeField()),
+                ("blocked_until", models.DateTimeField(blank=True, null=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="service_onfido.company",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("company", "upstream")},
+            },
+        ),
+    ]
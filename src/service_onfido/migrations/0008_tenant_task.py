@@ -0,0 +1,52 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0007_rate_limit_bucket"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TenantTask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("task", models.CharField(max_length=100)),
+                ("object_id", models.BigIntegerField()),
+                ("dispatched", models.DateTimeField(blank=True, null=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="service_onfido.company",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="tenanttask",
+            index=models.Index(
+                condition=models.Q(("dispatched__isnull", True)),
+                fields=["company", "task", "created"],
+                name="tenanttask_pending_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="tenanttask",
+            unique_together={("task", "object_id")},
+        ),
+    ]
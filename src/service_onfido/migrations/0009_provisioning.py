@@ -0,0 +1,60 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+import enumfields.fields
+import service_onfido.enums
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0008_tenant_task"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Provisioning",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("identifier", models.UUIDField(default=uuid.uuid4, unique=True)),
+                (
+                    "status",
+                    enumfields.fields.EnumField(
+                        default="pending",
+                        enum=service_onfido.enums.ProvisioningStatus,
+                        max_length=50,
+                    ),
+                ),
+                ("cursor", models.CharField(blank=True, max_length=500, null=True)),
+                ("processed", models.PositiveIntegerField(default=0)),
+                ("provisioned", models.PositiveIntegerField(default=0)),
+                ("failed", models.PositiveIntegerField(default=0)),
+                ("completed", models.DateTimeField(blank=True, null=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="service_onfido.company",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="provisioning",
+            index=models.Index(
+                fields=["company", "-created"], name="provisioning_company_idx"
+            ),
+        ),
+    ]
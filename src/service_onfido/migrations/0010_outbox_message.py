@@ -0,0 +1,30 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0009_provisioning"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task", models.CharField(max_length=100)),
+                ("args", models.JSONField(default=list)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
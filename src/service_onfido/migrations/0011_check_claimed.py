@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0010_outbox_message"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="check",
+            name="claimed",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0011_check_claimed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="check",
+            name="next_sweep",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="check",
+            name="sweeps",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="next_sweep",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="sweeps",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:25
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built without blocking writes to the tables.
+    atomic = False
+
+    dependencies = [
+        ("service_onfido", "0012_sweep_backoff"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="onfidoresponse",
+            index=models.Index(
+                condition=models.Q(("expires__isnull", False)),
+                fields=["expires"],
+                name="onfidoresponse_expires_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0013_response_expires_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="onfidowebhook",
+            name="claimed",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="platformwebhook",
+            name="claimed",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
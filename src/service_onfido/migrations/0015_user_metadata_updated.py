@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("service_onfido", "0014_webhook_claimed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="metadata_updated",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,40 +1,52 @@
-import os
+import zlib
 import uuid
-import requests
 import json
 import mimetypes
 from logging import getLogger
 from decimal import Decimal
 from datetime import timedelta
-from io import BytesIO, BufferedReader
+from collections import defaultdict
+from io import BufferedReader
 
-import onfido
 from onfido.regions import Region
 from onfido.exceptions import OnfidoInvalidSignatureError, OnfidoRequestError
 from enumfields import EnumField
-from rehive import Rehive, APIException
-from django.db import models, transaction, IntegrityError
-from django.db.models import Q
+from django.db import (
+    models, transaction, connection, IntegrityError, close_old_connections
+)
+from django.db.models import Q, F
+from django.db.models.constants import OnConflict
 from django.utils.functional import cached_property
 from django.utils.timezone import now
 from django.contrib.postgres.fields import ArrayField
 from django_rehive_extras.models import DateModel, StateModel
 from django.utils.functional import cached_property
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from rest_framework import status
 
 from config import settings
 from service_onfido.exceptions import (
     PlatformWebhookProcessingError, OnfidoWebhookProcessingError,
-    UserProcessingError, DocumentProcessingError, CheckProcessingError
+    UserProcessingError, DocumentProcessingError, CheckProcessingError,
+    InvalidUserError, InvalidDocumentError, InvalidCheckError,
+    ProvisioningError
 )
 from service_onfido.enums import (
     WebhookEvent, OnfidoDocumentType, CheckStatus, DocumentTypeSide,
-    OnfidoDocumentReportResult
+    OnfidoDocumentReportResult, ProvisioningStatus
 )
 from service_onfido.utils.common import (
-    get_unique_filename, to_cents, truncate, from_cents
+    get_unique_filename, to_cents, truncate, from_cents, fan_out
 )
+from service_onfido.utils.clients import onfido_clients, rehive_clients
+from service_onfido.utils.files import download_file
+from service_onfido.utils.batching import MicroBatcher
+from service_onfido.caches import response_cache
+from service_onfido.schedulers import fair_scheduler
+from service_onfido.pipelines import async_pipeline
+from service_onfido.outboxes import outbox
+from service_onfido.retries import is_retryable
+from service_onfido.breakers import get_circuit_error
+from service_onfido.limiters import rate_limiter
 import service_onfido.tasks as tasks
 
 
@@ -59,10 +71,12 @@ class Company(DateModel, StateModel):
     def __str__(self):
         return self.identifier
 
-    @transaction.atomic
     def save(self, *args, **kwargs):
         """
         Configure webhooks.
+
+        Onfido is configured before the company is saved, and outside of a
+        transaction so that no locks are held during the Onfido requests.
         """
 
         # If the onfido API key is changing.
@@ -72,6 +86,24 @@ class Company(DateModel, StateModel):
 
         super().save(*args, **kwargs)
 
+    @property
+    def onfido_api(self):
+        """
+        Get a pooled, rate limited Onfido API client for the company.
+        """
+
+        return onfido_clients.get(
+            self.onfido_api_key, Region.EU, company_id=self.id
+        )
+
+    @property
+    def rehive_api(self):
+        """
+        Get a pooled, rate limited Rehive API client for the company admin.
+        """
+
+        return rehive_clients.get(self.admin.token, company_id=self.id)
+
     @property
     def configured(self):
         """
@@ -91,13 +123,17 @@ class Company(DateModel, StateModel):
         Configure the company using the Onfido API key.
         """
 
+        # Discard pooled clients for the API key that is being replaced.
+        if self.original and self.original.onfido_api_key:
+            onfido_clients.evict(self.original.onfido_api_key)
+
         # If no API key is set, remove the webhook details.
         if not self.onfido_api_key:
             self.onfido_webhook_id = None
             self.onfido_webhook_token = None
             return
 
-        onfido_api = onfido.Api(self.onfido_api_key, region=Region.EU)
+        onfido_api = self.onfido_api
 
         # If a webhook already exists, delete it.
         if self.onfido_webhook_id:
@@ -129,6 +165,39 @@ class Company(DateModel, StateModel):
         self.onfido_webhook_token = webhook["token"]
 
 
+class UserManager(models.Manager):
+
+    @transaction.atomic
+    def create_using_platform_event(self, company, data):
+        """
+        Create a user using event data from the platform.
+
+        The onfido applicant is generated in the background so that it does
+        not have to be generated when the user's first document is processed.
+        Events for companies that are not configured yet are ignored so that
+        the webhook is completed rather than failed, the user is created when
+        their first document is processed instead.
+        """
+
+        if not company.configured:
+            return None
+
+        # Ensure the event data has the necessary fields.
+        try:
+            identifier = uuid.UUID(data["id"])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidUserError("Invalid user event data.")
+
+        user, created = self.get_or_create(
+            identifier=identifier, company=company
+        )
+
+        if not user.metadata_updated:
+            user.generate_async()
+
+        return user
+
+
 class User(DateModel):
     identifier = models.UUIDField(unique=True, default=uuid.uuid4)
     token = models.CharField(max_length=200, null=True)
@@ -138,6 +207,14 @@ class User(DateModel):
     onfido_id = models.CharField(
         unique=True, max_length=64, null=True
     )
+    # Set once the applicant has been added to the Rehive user's metadata.
+    metadata_updated = models.DateTimeField(null=True, blank=True)
+
+    # Key of the advisory locks that serialize applicant creation (the second
+    # key is a hash of the user identifier).
+    LOCK_KEY = zlib.crc32(b"service_onfido.models.User") & 0x7fffffff
+
+    objects = UserManager()
 
     def __str__(self):
         return str(self.identifier)
@@ -159,7 +236,7 @@ class User(DateModel):
         Get the resource directly from platform.
         """
 
-        rehive = Rehive(self.company.admin.token)
+        rehive = self.company.rehive_api
 
         return rehive.admin.users.documents.get(self.identifier)
 
@@ -170,30 +247,35 @@ class User(DateModel):
         """
 
         if not self.onfido_id:
-            raise UserProcessingError("Improperly configured user")
+            raise InvalidUserError("Improperly configured user")
 
         if not self.company.configured:
-            raise UserProcessingError("Improperly configured company.")
-
-        onfido_api = onfido.Api(self.company.onfido_api_key, region=Region.EU)
-
-        return onfido_api.applicant.find(self.onfido_id)
+            raise InvalidUserError("Improperly configured company.")
+
+        # Applicants can change at any time so they are never final.
+        return response_cache.get_or_fetch(
+            self.company_id,
+            "applicant",
+            self.onfido_id,
+            lambda: self.company.onfido_api.applicant.find(self.onfido_id)
+        )
 
     def generate_async(self):
         """
         Generate the user asynchronously.
         """
 
-        tasks.generate_user.delay(self.id)
+        outbox.enqueue(tasks.generate_user, self.id)
 
     def generate(self):
         """
         Generate the user.
 
         Generates an Onfido resource and populates the platform metadata.
+        Either step is skipped if it has already been done.
         """
 
-        if self.onfido_id:
+        if self.metadata_updated:
             return
 
         self.generate_onfido_resource()
@@ -208,22 +290,46 @@ class User(DateModel):
             return
 
         if not self.company.configured:
-            raise UserProcessingError("Improperly configured company.")
-
-        onfido_api = onfido.Api(self.company.onfido_api_key, region=Region.EU)
-
-        # Create customer on onfido.
-        applicant = onfido_api.applicant.create({
-            # TODO : Populate with the correct values.
-            # Can default to dummy values as well.
-            "first_name": "PLACEHOLDER",
-            "last_name": "PLACEHOLDER",
-            #"dob": "1984-01-01",
-            #"address": {}
-        })
+            raise InvalidUserError("Improperly configured company.")
+
+        # Only create a single applicant per user at a time. A session lock is
+        # used (instead of a transaction lock) so that no transaction is held
+        # open during the Onfido request. Callers that waited for the lock
+        # reuse the applicant instead of creating another one.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_lock(%s, hashtext(%s))",
+                [self.LOCK_KEY, str(self.identifier)]
+            )
 
-        self.onfido_id = applicant["id"]
-        self.save()
+        try:
+            onfido_id = User.objects.filter(id=self.id).values_list(
+                'onfido_id', flat=True
+            ).get()
+            if onfido_id:
+                self.onfido_id = onfido_id
+                return
+
+            onfido_api = self.company.onfido_api
+
+            # Create customer on onfido.
+            applicant = onfido_api.applicant.create({
+                # TODO : Populate with the correct values.
+                # Can default to dummy values as well.
+                "first_name": "PLACEHOLDER",
+                "last_name": "PLACEHOLDER",
+                #"dob": "1984-01-01",
+                #"address": {}
+            })
+
+            self.onfido_id = applicant["id"]
+            self.save(update_fields=['onfido_id', 'updated'])
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(%s, hashtext(%s))",
+                    [self.LOCK_KEY, str(self.identifier)]
+                )
 
     def generate_platform_resource(self):
         """
@@ -238,16 +344,405 @@ class User(DateModel):
             }
         })
 
+        self.metadata_updated = now()
+        self.save(update_fields=['metadata_updated', 'updated'])
+
     def update_platform_resource(self, data):
         """
         Update the platform resources with data.
         """
 
-        rehive = Rehive(self.company.admin.token)
+        rehive = self.company.rehive_api
 
         rehive.admin.users.patch(str(self.identifier), **data)
 
 
+class ProvisioningManager(models.Manager):
+
+    @transaction.atomic
+    def start(self, company):
+        """
+        Start provisioning applicants for a company. A failed provisioning is
+        resumed from its last checkpoint.
+        """
+
+        if not company.configured:
+            raise ProvisioningError("Improperly configured company.")
+
+        # Lock on the company to ensure only a single provisioning can be
+        # started at a time per company.
+        Company.objects.select_for_update().get(id=company.id)
+
+        provisioning = self.filter(company=company).exclude(
+            status=ProvisioningStatus.COMPLETE
+        ).order_by('-created').first()
+
+        if provisioning is None:
+            return self.create(company=company)
+
+        if provisioning.status != ProvisioningStatus.FAILED:
+            raise ProvisioningError("A provisioning is already in progress.")
+
+        provisioning.status = ProvisioningStatus.PENDING
+        provisioning.save()
+
+        return provisioning
+
+
+class Provisioning(DateModel):
+    """
+    Provision Onfido applicants for all the Rehive users of a company.
+
+    Users are fetched from Rehive a page at a time and the cursor of the next
+    page is saved after each page, so a provisioning can be resumed from its
+    last checkpoint. Users whose applicant has already been added to their
+    Rehive metadata are skipped.
+    """
+
+    identifier = models.UUIDField(unique=True, default=uuid.uuid4)
+    company = models.ForeignKey(
+        'service_onfido.Company', on_delete=models.CASCADE
+    )
+    status = EnumField(
+        ProvisioningStatus, max_length=50, default=ProvisioningStatus.PENDING
+    )
+    # Pagination query of the next page of Rehive users.
+    cursor = models.CharField(max_length=500, null=True, blank=True)
+    # Progress counters.
+    processed = models.PositiveIntegerField(default=0)
+    provisioned = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    completed = models.DateTimeField(null=True, blank=True)
+
+    # Key of the advisory locks that ensure a provisioning only runs once at a
+    # time (the second key is the provisioning ID).
+    LOCK_KEY = zlib.crc32(b"service_onfido.models.Provisioning") & 0x7fffffff
+
+    objects = ProvisioningManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['company', '-created'],
+                name='provisioning_company_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.identifier)
+
+    def run_async(self):
+        """
+        Run the provisioning asynchronously.
+        """
+
+        outbox.enqueue(tasks.provision_applicants, self.id)
+
+    def run(self, max_pages=None, callback=None):
+        """
+        Provision applicants from the last checkpoint.
+
+        Returns True once every user has been processed, False if there are
+        pages left and None if the provisioning is already running elsewhere.
+
+        max_pages: Max number of pages processed in this run
+        callback: Called with the provisioning after each page
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_try_advisory_lock(%s, %s)",
+                [self.LOCK_KEY, self.id]
+            )
+            if not cursor.fetchone()[0]:
+                return None
+
+        try:
+            return self._run(max_pages, callback)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(%s, %s)",
+                    [self.LOCK_KEY, self.id]
+                )
+
+    def _run(self, max_pages, callback):
+        self.refresh_from_db()
+
+        if self.status == ProvisioningStatus.COMPLETE:
+            return True
+
+        if not self.company.configured:
+            raise ProvisioningError("Improperly configured company.")
+
+        self.status = ProvisioningStatus.PROCESSING
+        self.save()
+
+        rehive_users = self.company.rehive_api.admin.users
+
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            if self.cursor:
+                rehive_users.next = self.cursor
+                results = rehive_users.get_next()
+            else:
+                results = rehive_users.get(filters={
+                    "page_size": getattr(settings, 'PROVISIONING_PAGE_SIZE')
+                })
+
+            self.provision_page(results)
+
+            # Save a checkpoint.
+            self.cursor = rehive_users.next
+            if not self.cursor:
+                self.status = ProvisioningStatus.COMPLETE
+                self.completed = now()
+            self.save()
+            pages += 1
+
+            if callback:
+                callback(self)
+
+            if self.status == ProvisioningStatus.COMPLETE:
+                return True
+
+        return False
+
+    def provision_page(self, results):
+        """
+        Provision applicants for a page of Rehive users concurrently.
+
+        If any user failed with an error that is worth retrying, an error is
+        raised without counting the page as processed, so that the page is
+        processed again when the provisioning is resumed.
+        """
+
+        identifiers = [uuid.UUID(u["id"]) for u in results]
+
+        User.objects.bulk_create(
+            [User(identifier=i, company=self.company) for i in identifiers],
+            ignore_conflicts=True
+        )
+        users = User.objects.select_related('company__admin').filter(
+            identifier__in=identifiers,
+            company=self.company,
+            metadata_updated__isnull=True
+        )
+
+        outcomes = async_pipeline.run(
+            lambda user: user.generate(), users, key=lambda u: u.company_id
+        )
+        failures = [exc for user, result, exc in outcomes if exc]
+        retryable = [exc for exc in failures if is_retryable(exc)]
+
+        self.provisioned += len(outcomes) - len(failures)
+
+        if retryable:
+            self.save()
+            raise ProvisioningError(
+                "Failed to provision {} of {} users.".format(
+                    len(retryable), len(outcomes)
+                )
+            ) from retryable[0]
+
+        for exc in failures:
+            logger.warning("Failed to provision a user: {}".format(exc))
+
+        self.processed += len(identifiers)
+        self.failed += len(failures)
+
+    def fail(self):
+        """
+        Mark the provisioning as failed so that it can be resumed.
+        """
+
+        Provisioning.objects.filter(id=self.id).update(
+            status=ProvisioningStatus.FAILED
+        )
+
+
+class WebhookManager(models.Manager):
+    """
+    Manager for ingesting webhooks idempotently.
+
+    Webhooks are inserted using `INSERT ... ON CONFLICT DO NOTHING RETURNING`
+    so that duplicates do not abort a statement, and only newly inserted
+    webhooks are processed. Inserts can optionally be micro-batched across
+    concurrent requests (see `WEBHOOK_BATCH_WAIT`).
+    """
+
+    _batcher = None
+
+    @property
+    def batcher(self):
+        if self._batcher is None:
+            self._batcher = MicroBatcher(
+                self._ingest_batch,
+                max_size=getattr(settings, 'WEBHOOK_BATCH_SIZE'),
+                max_wait=getattr(settings, 'WEBHOOK_BATCH_WAIT')
+            )
+
+        return self._batcher
+
+    def ingest(self, **kwargs):
+        """
+        Ingest a single webhook. Returns True if the webhook is new.
+        """
+
+        if not getattr(settings, 'WEBHOOK_BATCH_WAIT'):
+            return self.ingest_many([kwargs])[0]
+
+        return self.batcher.submit(kwargs).result(
+            timeout=getattr(settings, 'WEBHOOK_BATCH_TIMEOUT')
+        )
+
+    def _ingest_batch(self, rows):
+        # Batches are ingested on a background thread with its own database
+        # connection, so discard the connection if it is no longer usable.
+        close_old_connections()
+
+        return self.ingest_many(rows)
+
+    def ingest_many(self, rows):
+        """
+        Insert webhooks, ignoring ones that already exist, and process the
+        newly inserted ones asynchronously. Returns a list indicating which of
+        the rows were new.
+        """
+
+        objs = [self.model(**row) for row in rows]
+        opts = self.model._meta
+        inserted = self._insert(
+            objs,
+            fields=[f for f in opts.concrete_fields if not f.primary_key],
+            returning_fields=[
+                opts.pk,
+                opts.get_field('identifier'),
+                opts.get_field('company'),
+            ],
+            on_conflict=OnConflict.IGNORE,
+            using=self.db
+        )
+
+        # Single row inserts return None when the row already exists.
+        inserted = [r for r in inserted if r]
+
+        # Process new webhooks once they have been committed.
+        ids = [r[0] for r in inserted]
+        transaction.on_commit(
+            lambda: self.model.process_many_async(ids), using=self.db
+        )
+
+        # Only the first occurrence of a duplicated row can be new.
+        keys = set((r[1], r[2],) for r in inserted)
+        created = []
+        for obj in objs:
+            key = (obj.identifier, obj.company_id,)
+            created.append(key in keys)
+            keys.discard(key)
+
+        return created
+
+    def pending(self):
+        """
+        Get webhooks that have neither completed nor failed.
+        """
+
+        return self.filter(completed__isnull=True, failed__isnull=True)
+
+    def claim(self, ids=None, batch_size=None, min_age=None):
+        """
+        Claim pending webhooks and count a try for each of them.
+
+        Rows are claimed using `SELECT ... FOR UPDATE SKIP LOCKED` in a short
+        transaction that sets their `claimed` timestamp, so the webhook
+        processing tasks and the drainers never process the same webhook at
+        once. Claims expire after `WEBHOOK_CLAIM_LEASE` seconds (eg. if the
+        worker died). Returns the claimed webhooks.
+
+        ids: Only claim the webhooks with these IDs
+        batch_size: Max number of webhooks to claim
+        min_age: Only claim webhooks that have not been updated for `min_age`
+        """
+
+        lease = timedelta(seconds=getattr(settings, 'WEBHOOK_CLAIM_LEASE'))
+        queryset = self.pending().filter(
+            Q(claimed__isnull=True) | Q(claimed__lte=now() - lease)
+        )
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        # Only claim webhooks that have not been touched for `min_age`, so
+        # that recent (or recently failed) webhooks are left to their tasks.
+        if min_age:
+            queryset = queryset.filter(updated__lte=now() - min_age)
+
+        with transaction.atomic():
+            webhooks = list(
+                queryset.select_for_update(skip_locked=True, of=('self',))
+                    .select_related('company')
+                    .order_by('updated')[:batch_size]
+            )
+
+            claimed = now()
+            self.filter(id__in=[w.id for w in webhooks]).update(
+                claimed=claimed, tries=F('tries') + 1, updated=claimed
+            )
+
+        for webhook in webhooks:
+            webhook.claimed = claimed
+            webhook.tries = webhook.tries + 1
+            webhook.updated = claimed
+
+        return webhooks
+
+    def record(self, outcomes):
+        """
+        Record the outcomes of claimed webhooks and release their claims,
+        using a single update per outcome.
+
+        outcomes: List of (webhook, exception) tuples (see `attempt`)
+        """
+
+        ids = defaultdict(list)
+        for webhook, exc in outcomes:
+            if webhook.completed:
+                ids["completed"].append(webhook.id)
+            elif webhook.failed:
+                ids["failed"].append(webhook.id)
+            elif get_circuit_error(exc):
+                ids["deferred"].append(webhook.id)
+            else:
+                ids["pending"].append(webhook.id)
+
+        recorded = now()
+        values = {
+            "completed": {"completed": recorded},
+            "failed": {"failed": recorded},
+            # The upstream was not called, so do not count the try.
+            "deferred": {"tries": F('tries') - 1},
+            "pending": {},
+        }
+
+        for outcome, outcome_ids in ids.items():
+            self.filter(id__in=outcome_ids).update(
+                claimed=None, updated=recorded, **values[outcome]
+            )
+
+    def drain(self, batch_size=100, min_age=None):
+        """
+        Claim a batch of pending webhooks and process them.
+
+        The webhooks are processed outside of the claim transaction, and the
+        outcomes are recorded with a single update per outcome. Returns the
+        number of webhooks that were claimed.
+        """
+
+        webhooks = self.claim(batch_size=batch_size, min_age=min_age)
+        self.record([(webhook, webhook.attempt(),) for webhook in webhooks])
+
+        return len(webhooks)
+
+
 class PlatformWebhook(DateModel):
     # Webhook data.
     identifier = models.CharField(max_length=64, unique=True)
@@ -260,12 +755,24 @@ class PlatformWebhook(DateModel):
     completed = models.DateTimeField(null=True)
     failed = models.DateTimeField(null=True)
     tries = models.IntegerField(default=0)
+    # Set while the webhook is claimed for processing (see `claim`).
+    claimed = models.DateTimeField(null=True, blank=True)
 
     # Max number of retries allowed.
     MAX_RETRIES = 6
 
+    objects = WebhookManager()
+
     class Meta:
         unique_together = ('identifier', 'company',)
+        indexes = [
+            # Keep the claim query for pending webhooks cheap.
+            models.Index(
+                fields=['updated'],
+                condition=Q(completed__isnull=True, failed__isnull=True),
+                name='platformwebhook_pending_idx'
+            ),
+        ]
 
     def __str__(self):
         return str(self.identifier)
@@ -277,32 +784,69 @@ class PlatformWebhook(DateModel):
 
         tasks.process_platform_webhook.delay(self.id)
 
-    def process(self):
+    @staticmethod
+    def process_many_async(ids):
         """
-        Process the platform webhook.
+        Process multiple platform webhooks asynchronously.
         """
 
-        # Increment the number of tries.
-        self.tries = self.tries + 1
+        tasks.apply_async_many(
+            tasks.process_platform_webhook, [(i,) for i in ids]
+        )
+
+    def handle(self):
+        """
+        Handle the platform webhook event.
+        """
 
-        try:
-            if self.event == WebhookEvent.DOCUMENT_CREATE:
-                Document.objects.create_using_platform_event(
-                    self.company, self.data
-                )
-            # FUTURE : Add functionality to handle check withdrawal.
-            # updated directly in the platform.
-            # elif self.event == WebhookEvent.DOCUMENT_UPDATE:
-            #     pass
+        if self.event == WebhookEvent.DOCUMENT_CREATE:
+            Document.objects.create_using_platform_event(
+                self.company, self.data
+            )
+        elif self.event == WebhookEvent.USER_CREATE:
+            User.objects.create_using_platform_event(self.company, self.data)
+        # FUTURE : Add functionality to handle check withdrawal.
+        # updated directly in the platform.
+        # elif self.event == WebhookEvent.DOCUMENT_UPDATE:
+        #     pass
 
+    def attempt(self):
+        """
+        Attempt to handle a claimed platform webhook and record the outcome on
+        the instance without saving it. Returns the exception if it failed.
+
+        The webhook is handled without a surrounding transaction, so that no
+        locks are held during the remote requests it makes.
+        """
+
+        try:
+            self.handle()
         except Exception as exc:
-            self.failed = now() if self.tries > self.MAX_RETRIES else None
-            self.save()
+            if get_circuit_error(exc):
+                # The upstream was not called, so do not count the try.
+                self.tries = self.tries - 1
+                logger.warning(exc)
+                return exc
+            # Errors that are not retryable fail immediately.
+            self.failed = (
+                now() if self.tries > self.MAX_RETRIES
+                or not is_retryable(exc) else None
+            )
             logger.exception(exc)
-            raise PlatformWebhookProcessingError(exc)
+            return exc
         else:
             self.completed = now()
-            self.save()
+
+    def process(self):
+        """
+        Process a claimed platform webhook and record the outcome.
+        """
+
+        exc = self.attempt()
+        PlatformWebhook.objects.record([(self, exc,)])
+
+        if exc:
+            raise PlatformWebhookProcessingError(exc) from exc
 
 
 class OnfidoWebhook(DateModel):
@@ -316,12 +860,24 @@ class OnfidoWebhook(DateModel):
     completed = models.DateTimeField(null=True)
     failed = models.DateTimeField(null=True)
     tries = models.IntegerField(default=0)
+    # Set while the webhook is claimed for processing (see `claim`).
+    claimed = models.DateTimeField(null=True, blank=True)
 
     # Max number of retries allowed.
     MAX_RETRIES = 6
 
+    objects = WebhookManager()
+
     class Meta:
         unique_together = ('identifier', 'company',)
+        indexes = [
+            # Keep the claim query for pending webhooks cheap.
+            models.Index(
+                fields=['updated'],
+                condition=Q(completed__isnull=True, failed__isnull=True),
+                name='onfidowebhook_pending_idx'
+            ),
+        ]
 
     def __str__(self):
         return str(self.identifier)
@@ -333,40 +889,93 @@ class OnfidoWebhook(DateModel):
 
         tasks.process_onfido_webhook.delay(self.id)
 
-    def process(self):
+    @staticmethod
+    def process_many_async(ids):
         """
-        Process the onfido webhook.
+        Process multiple onfido webhooks asynchronously.
         """
 
-        # Increment the number of tries.
-        self.tries = self.tries + 1
+        tasks.apply_async_many(
+            tasks.process_onfido_webhook, [(i,) for i in ids]
+        )
 
-        try:
-            # Perform necessary functionality based on the payload action.
-            if self.payload.get("action") in "check.completed":
-                # Try and get a check in the service database.
-                try:
-                    check = Check.objects.get(
-                        onfido_id=self.payload["object"]["id"],
-                        user__company=self.company
-                    )
-                except Check.DoesNotExist:
-                    pass
-                # Evaluate the check if it exists.
+    def handle(self):
+        """
+        Handle the onfido webhook payload.
+        """
+
+        # Perform necessary functionality based on the payload action.
+        if self.payload.get("action") == "check.completed":
+            # Try and get a check in the service database.
+            try:
+                check = Check.objects.select_related(
+                    'user__company__admin'
+                ).get(
+                    onfido_id=self.payload["object"]["id"],
+                    user__company=self.company
+                )
+            except Check.DoesNotExist:
+                pass
+            # Evaluate the check if it exists.
+            else:
+                # The payload has been verified, so trust the status it
+                # carries instead of fetching the check from Onfido again.
+                check.store_onfido_results(
+                    onfido_status=self.payload["object"].get("status")
+                )
+
+                if check.status in (CheckStatus.COMPLETE, CheckStatus.FAILED):
+                    return
+
+                # Evaluate in this task so that the outcome is recorded on the
+                # webhook and failures are retried by the webhook retry
+                # policy. The webhook is claimed but not locked, so no locks
+                # are held during the Onfido and Rehive requests.
+                if getattr(settings, 'WEBHOOK_EVALUATE_CHECKS'):
+                    check.evaluate()
                 else:
                     check.evaluate_async()
-            # FUTURE : Add functionality to handle check withdrawal.
-            # elif self.payload.get("action") in "check.withdrawn":
-            #     pass
+        # FUTURE : Add functionality to handle check withdrawal.
+        # elif self.payload.get("action") == "check.withdrawn":
+        #     pass
 
+    def attempt(self):
+        """
+        Attempt to handle a claimed onfido webhook and record the outcome on
+        the instance without saving it. Returns the exception if it failed.
+
+        The webhook is handled without a surrounding transaction, so that no
+        locks are held during the remote requests it makes.
+        """
+
+        try:
+            self.handle()
         except Exception as exc:
-            self.failed = now() if self.tries > self.MAX_RETRIES else None
-            self.save()
+            if get_circuit_error(exc):
+                # The upstream was not called, so do not count the try.
+                self.tries = self.tries - 1
+                logger.warning(exc)
+                return exc
+            # Errors that are not retryable fail immediately.
+            self.failed = (
+                now() if self.tries > self.MAX_RETRIES
+                or not is_retryable(exc) else None
+            )
             logger.exception(exc)
-            raise OnfidoWebhookProcessingError(exc)
+            return exc
         else:
             self.completed = now()
-            self.save()
+
+    def process(self):
+        """
+        Process a claimed onfido webhook and record the outcome.
+        """
+
+        exc = self.attempt()
+        OnfidoWebhook.objects.record([(self, exc,)])
+
+        if exc:
+            raise OnfidoWebhookProcessingError(exc) from exc
 
 
 class DocumentType(DateModel):
@@ -416,14 +1025,16 @@ class DocumentType(DateModel):
 
 class DocumentManager(models.Manager):
 
-    @transaction.atomic
     def create_using_platform_event(self, company, data):
         """
         Create a document using event data from the platform.
+
+        Not atomic, so that no locks are held while the user's onfido resource
+        is generated.
         """
 
         if not company.configured:
-            raise DocumentProcessingError("Improperly configured company.")
+            raise InvalidDocumentError("Improperly configured company.")
 
         # Ensure the event data has the necessary fields.
         try:
@@ -431,7 +1042,7 @@ class DocumentManager(models.Manager):
             platform_user = data["user"]
             platform_type = data["type"]
         except KeyError:
-            raise DocumentProcessingError("Invalid document event data.")
+            raise InvalidDocumentError("Invalid document event data.")
 
         # Find a document type using the event data.
         try:
@@ -439,7 +1050,7 @@ class DocumentManager(models.Manager):
                 platform_type=platform_type["id"], company=company
             )
         except DocumentType.DoesNotExist:
-            raise DocumentProcessingError(
+            raise InvalidDocumentError(
                 "A document type mapping has not been configured."
             )
 
@@ -448,8 +1059,8 @@ class DocumentManager(models.Manager):
             identifier=uuid.UUID(platform_user['id']), company=company
         )
 
-        # Ensure the user's onfido resource has been generated.
-        # TODO : Should this occur when the user is created for the first time.
+        # Ensure the user's onfido resource has been generated. This is usually
+        # done in the background when the user is created (see `UserManager`).
         user.generate()
 
         # Create the document in the service.
@@ -457,6 +1068,18 @@ class DocumentManager(models.Manager):
             user=user, platform_id=document_id, type=document_type
         )
 
+    def stale(self, min_age, max_age):
+        """
+        Get documents that were created between `max_age` and `min_age` ago
+        but never had an onfido resource generated.
+        """
+
+        return self.filter(
+            onfido_id__isnull=True,
+            created__gt=now() - max_age,
+            created__lte=now() - min_age
+        )
+
 
 class Document(DateModel):
     """
@@ -474,6 +1097,10 @@ class Document(DateModel):
     type = models.ForeignKey(
         'service_onfido.DocumentType', on_delete=models.CASCADE
     )
+    # Number of times the sweeper re-submitted the document and when it may
+    # do so again (see `tasks.sweep_stale_resources`).
+    sweeps = models.PositiveSmallIntegerField(default=0)
+    next_sweep = models.DateTimeField(null=True, blank=True)
 
     objects = DocumentManager()
 
@@ -488,6 +1115,14 @@ class Document(DateModel):
                 name='document_unique_user_onfido_id'
             ),
         ]
+        indexes = [
+            # Keep the query for stale documents cheap.
+            models.Index(
+                fields=['created', 'id'],
+                condition=Q(onfido_id__isnull=True),
+                name='document_no_onfido_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return str(self.identifier)
@@ -498,7 +1133,7 @@ class Document(DateModel):
         Get the resource directly from platform.
         """
 
-        rehive = Rehive(self.user.company.admin.token)
+        rehive = self.user.company.rehive_api
 
         return rehive.admin.users.documents.get(self.platform_id)
 
@@ -509,23 +1144,28 @@ class Document(DateModel):
         """
 
         if not self.onfido_id:
-            raise DocumentProcessingError("Improperly configured document.")
+            raise InvalidDocumentError("Improperly configured document.")
 
         if not self.user.company.configured:
-            raise DocumentProcessingError("Improperly configured company.")
-
-        onfido_api = onfido.Api(
-            self.user.company.onfido_api_key, region=Region.EU
+            raise InvalidDocumentError("Improperly configured company.")
+
+        # Uploaded documents do not change.
+        return response_cache.get_or_fetch(
+            self.user.company_id,
+            "document",
+            self.onfido_id,
+            lambda: self.user.company.onfido_api.document.find(self.onfido_id),
+            final=lambda data: True
         )
 
-        return onfido_api.document.find(self.onfido_id)
-
     def generate_async(self):
         """
         Generate the document asynchronously.
         """
 
-        tasks.generate_document.delay(self.id)
+        fair_scheduler.submit(
+            tasks.generate_document, self.user.company_id, self.id
+        )
 
     def generate(self):
         """
@@ -549,18 +1189,7 @@ class Document(DateModel):
             return
 
         if not self.user.company.configured:
-            raise DocumentProcessingError("Improperly configured company.")
-
-        # Retrieve a file object using the Rehive resource URL.
-        file_url = self.platform_resource["file"]
-        res = requests.get(file_url, stream=True)
-        if res.status_code != status.HTTP_200_OK:
-            raise DocumentProcessingError("Invalid document file.")
-
-        # Convert the bytes into a file.
-        file = BytesIO(res.content)
-        file.name = os.path.basename(file_url).split("?")[0]
-        file.seek(0)
+            raise InvalidDocumentError("Improperly configured company.")
 
         # Generate ondifo document data.
         data = {
@@ -571,12 +1200,18 @@ class Document(DateModel):
         if self.type.side:
             data["side"] = self.type.side.value
 
-        onfido_api = onfido.Api(
-            self.user.company.onfido_api_key, region=Region.EU
-        )
+        onfido_api = self.user.company.onfido_api
 
-        # Upload the document to the Onfido servers.
-        onfido_document = onfido_api.document.upload(file, data)
+        # Stream the file from the Rehive resource URL into a temporary file
+        # and upload it to the Onfido servers.
+        with download_file(
+                self.platform_resource["file"],
+                session=rehive_clients.session,
+                max_size=getattr(settings, 'DOCUMENT_MAX_SIZE'),
+                spool_size=getattr(settings, 'DOCUMENT_SPOOL_SIZE'),
+                chunk_size=getattr(settings, 'DOCUMENT_CHUNK_SIZE'),
+                timeout=rehive_clients.timeout) as file:
+            onfido_document = onfido_api.document.upload(file, data)
 
         # Record the onfido ID on this object.
         self.onfido_id = onfido_document["id"]
@@ -604,7 +1239,7 @@ class Document(DateModel):
         Update the platform resources with data.
         """
 
-        rehive = Rehive(self.user.company.admin.token)
+        rehive = self.user.company.rehive_api
 
         rehive.admin.users.documents.patch(self.platform_id, **data)
 
@@ -615,7 +1250,7 @@ class Document(DateModel):
         """
 
         if not self.onfido_id:
-            raise DocumentProcessingError("Improperly configured document.")
+            raise InvalidDocumentError("Improperly configured document.")
 
         # Lock on the user to ensure only a single check can be created at a
         # time per user.
@@ -667,6 +1302,72 @@ class CheckManager(models.Manager):
 
         return check
 
+    def stale(self, min_age, max_age):
+        """
+        Get checks that have been processing since between `max_age` and
+        `min_age` ago without being evaluated.
+        """
+
+        return self.filter(
+            status=CheckStatus.PROCESSING,
+            onfido_id__isnull=False,
+            updated__gt=now() - max_age,
+            updated__lte=now() - min_age
+        )
+
+    def reclaim_expired(self, lease):
+        """
+        Release processing checks that were claimed more than `lease` ago but
+        never got an onfido check (eg. the worker died after the claim), so
+        that they can be claimed again. Returns the number of released checks.
+        """
+
+        return self.filter(
+            Q(claimed__lte=now() - lease)
+            | Q(claimed__isnull=True, updated__lte=now() - lease),
+            status=CheckStatus.PROCESSING,
+            onfido_id__isnull=True
+        ).update(status=CheckStatus.PENDING, claimed=None)
+
+    def stalled_heads(self, min_age, max_age):
+        """
+        Get pending checks at the head of an idle user check queue that have
+        not changed for between `max_age` and `min_age` (eg. because their
+        task was lost or ran out of retries).
+        """
+
+        heads = self.filter(status=CheckStatus.PENDING).exclude(
+            user__in=self.filter(
+                status=CheckStatus.PROCESSING
+            ).values('user')
+        ).order_by('user', 'created').distinct('user').values('id')
+
+        return self.filter(
+            id__in=heads,
+            updated__gt=now() - max_age,
+            updated__lte=now() - min_age
+        )
+
+    def queue_head(self, user):
+        """
+        Get the check at the head of a user's check queue.
+
+        The processing check (there is at most one) takes precedence over the
+        oldest pending check, so the head is only pending when the queue is
+        idle. Returns None if the queue is empty.
+        """
+
+        return self.filter(
+            user=user,
+            status__in=(CheckStatus.PROCESSING, CheckStatus.PENDING,)
+        ).order_by(
+            models.Case(
+                models.When(status=CheckStatus.PROCESSING, then=0),
+                default=1
+            ),
+            "created"
+        ).first()
+
 
 class Check(DateModel):
     """
@@ -689,6 +1390,19 @@ class Check(DateModel):
     status = EnumField(
         CheckStatus, max_length=50, default=CheckStatus.INITIATING
     )
+    # Set when the check is claimed for processing (see `claim`).
+    claimed = models.DateTimeField(null=True, blank=True)
+    # Number of times the sweeper re-submitted the check and when it may do
+    # so again (see `tasks.sweep_stale_resources`).
+    sweeps = models.PositiveSmallIntegerField(default=0)
+    next_sweep = models.DateTimeField(null=True, blank=True)
+    # Final Onfido results, stored so that evaluations are not refetched.
+    onfido_status = models.CharField(max_length=50, null=True, blank=True)
+    onfido_reports = models.JSONField(null=True, blank=True)
+
+    # Onfido check and report statuses that will not change anymore.
+    ONFIDO_FINAL_STATUSES = ("complete", "withdrawn",)
+    ONFIDO_FINAL_REPORT_STATUSES = ("complete", "withdrawn", "cancelled",)
 
     objects = CheckManager()
 
@@ -703,6 +1417,22 @@ class Check(DateModel):
                 name='unique_processing_check_per_user'
             ),
         ]
+        indexes = [
+            # Keep the query for stale checks cheap.
+            models.Index(
+                fields=['updated', 'id'],
+                condition=Q(status=CheckStatus.PROCESSING),
+                name='check_processing_idx'
+            ),
+            # Keep the per user check queue cheap regardless of history.
+            models.Index(
+                fields=['user', 'created'],
+                condition=Q(
+                    status__in=(CheckStatus.PROCESSING, CheckStatus.PENDING,)
+                ),
+                name='check_queue_idx'
+            ),
+        ]
 
     def __str__(self):
         return str(self.identifier)
@@ -714,17 +1444,19 @@ class Check(DateModel):
         """
 
         if not self.onfido_id:
-            raise CheckProcessingError("Improperly configured check.")
+            raise InvalidCheckError("Improperly configured check.")
 
         if not self.user.company.configured:
-            raise CheckProcessingError("Improperly configured company.")
-
-        onfido_api = onfido.Api(
-            self.user.company.onfido_api_key, region=Region.EU
+            raise InvalidCheckError("Improperly configured company.")
+
+        return response_cache.get_or_fetch(
+            self.user.company_id,
+            "check",
+            self.onfido_id,
+            lambda: self.user.company.onfido_api.check.find(self.onfido_id),
+            final=lambda data: data["status"] in self.ONFIDO_FINAL_STATUSES
         )
 
-        return onfido_api.check.find(self.onfido_id)
-
     @cached_property
     def onfido_report_resources(self):
         """
@@ -732,23 +1464,31 @@ class Check(DateModel):
         """
 
         if not self.onfido_id:
-            raise CheckProcessingError("Improperly configured check.")
+            raise InvalidCheckError("Improperly configured check.")
 
         if not self.user.company.configured:
-            raise CheckProcessingError("Improperly configured company.")
-
-        onfido_api = onfido.Api(
-            self.user.company.onfido_api_key, region=Region.EU
+            raise InvalidCheckError("Improperly configured company.")
+
+        return response_cache.get_or_fetch(
+            self.user.company_id,
+            "check_reports",
+            self.onfido_id,
+            lambda: self.user.company.onfido_api.report.all(
+                self.onfido_id
+            )["reports"],
+            final=lambda data: all(
+                r["status"] in self.ONFIDO_FINAL_REPORT_STATUSES for r in data
+            )
         )
 
-        return onfido_api.report.all(self.onfido_id)["reports"]
-
     def generate_async(self):
         """
         Generate the check asynchronously.
         """
 
-        tasks.generate_check.delay(self.id)
+        fair_scheduler.submit(
+            tasks.generate_check, self.user.company_id, self.id
+        )
 
     def generate(self):
         """
@@ -762,73 +1502,137 @@ class Check(DateModel):
 
         self.generate_onfido_resource()
 
-    @transaction.atomic
     def generate_onfido_resource(self):
         """
         Generate the onfido resources for this check.
+
+        The check is claimed in a short locked step and the Onfido check is
+        created afterwards, so that no locks are held during the request.
         """
 
         if self.onfido_id:
             return
 
         if not self.user.company.configured:
-            raise CheckProcessingError("Improperly configured company.")
+            raise InvalidCheckError("Improperly configured company.")
+
+        if not self.claim():
+            return
+
+        onfido_api = self.user.company.onfido_api
+
+        # Generate the check.
+        try:
+            check = onfido_api.check.create({
+                "applicant_id": self.user.onfido_id,
+                "report_names": ["document"],
+                "document_ids": [d.onfido_id for d in self.documents.all()]
+            })
+        except Exception:
+            # Release the claim so that the generation can be retried.
+            Check.objects.filter(
+                id=self.id,
+                status=CheckStatus.PROCESSING,
+                onfido_id__isnull=True
+            ).update(status=CheckStatus.PENDING, claimed=None)
+            raise
 
-        # Lock on the user to ensure only a single check per user can have
-        # onfido resources generated at a time.
+        self.onfido_id = check["id"]
+        self.save()
+
+    @transaction.atomic
+    def claim(self):
+        """
+        Transition a pending check to processing. Returns False if the check
+        has already been claimed.
+
+        Claims that never get an onfido check are released by the sweeper
+        after `CHECK_CLAIM_LEASE` seconds.
+        """
+
+        # Lock on the user to ensure only a single check per user can be
+        # claimed at a time.
         user = User.objects.select_for_update().get(id=self.user.id)
 
+        check = Check.objects.select_for_update().get(id=self.id)
+        if check.onfido_id or check.status != CheckStatus.PENDING:
+            return False
+
         # Change status of this check
         self.status = CheckStatus.PROCESSING
+        self.claimed = now()
         self.save()
 
-        onfido_api = onfido.Api(
-            self.user.company.onfido_api_key, region=Region.EU
-        )
+        return True
 
-        # Generate the check.
-        check = onfido_api.check.create({
-            "applicant_id": self.user.onfido_id,
-            "report_names": ["document"],
-            "document_ids": [d.onfido_id for d in self.documents.all()]
-        })
+    def store_onfido_results(self, onfido_status=None, onfido_reports=None):
+        """
+        Store final Onfido results on the check.
 
-        self.onfido_id = check["id"]
-        self.save()
+        A status is only stored once it is final, and reports are only stored
+        for a check with a final status. The row is updated directly so that
+        no save signals are sent.
+        """
+
+        data = {}
+
+        if onfido_status:
+            self.onfido_status = onfido_status
+            if onfido_status in self.ONFIDO_FINAL_STATUSES:
+                data["onfido_status"] = onfido_status
+
+        if (onfido_reports is not None
+                and self.onfido_status in self.ONFIDO_FINAL_STATUSES):
+            self.onfido_reports = onfido_reports
+            data["onfido_reports"] = onfido_reports
+
+        if data:
+            Check.objects.filter(id=self.id).update(**data)
 
     def evaluate_async(self):
         """
         Evaluate a check asynchronously.
         """
 
-        tasks.evaluate_check.delay(self.id)
+        fair_scheduler.submit(
+            tasks.evaluate_check, self.user.company_id, self.id
+        )
 
-    @transaction.atomic
     def evaluate(self):
         """
         Evaluate a check.
 
         Evaluates each related check report to see if the platform needs updates.
+        The Onfido and Rehive requests are made without holding any locks and
+        the result is applied in a short locked step afterwards.
         """
 
         if self.status in (CheckStatus.COMPLETE, CheckStatus.FAILED,):
             raise Exception("Check has already been evaluated.")
 
-        # Lock on the user to ensure only a single check per user can be
-        # evaluated at a time.
-        user = User.objects.select_for_update().get(id=self.user.id)
-
-        # Retrieve an onfido check resource.
-        onfido_check = self.onfido_resource
+        # Retrieve the onfido check status.
+        if not self.onfido_status:
+            self.store_onfido_results(
+                onfido_status=self.onfido_resource["status"]
+            )
 
         # Check whether the check is ready for evaluation.
-        if onfido_check["status"] in ("complete", "withdrawn",):
-            self.status = CheckStatus.COMPLETE
-        else:
+        if self.onfido_status not in self.ONFIDO_FINAL_STATUSES:
             raise CheckProcessingError("Check is not ready to be evaluated.")
 
         # Retrieve a list of reports for the check.
-        onfido_reports = self.onfido_report_resources
+        if self.onfido_reports is None:
+            self.store_onfido_results(
+                onfido_reports=[
+                    {
+                        "name": r["name"],
+                        "status": r["status"],
+                        "sub_result": r.get("sub_result")
+                    }
+                    for r in self.onfido_report_resources
+                ]
+            )
+        onfido_reports = self.onfido_reports
 
         # Iterate through document reports and set a document_status.
         platform_document_status = None
@@ -842,16 +1646,156 @@ class Check(DateModel):
 
         # Apply document status changes to all related documents.
         if platform_document_status:
-            for d in self.documents.all():
-                metadata = {
+            data = {
+                "status": platform_document_status.value,
+                "metadata": {
                     "service_onfido": {
                         "check": self.onfido_id
                     }
                 }
-                d.update_platform_resource({
-                    "status": platform_document_status.value,
-                    "metadata": metadata
-                })
+            }
+            # The related rows are loaded and the rate limit tokens are taken
+            # up front so that the concurrent updates do not touch the
+            # database.
+            documents = list(
+                self.documents.select_related('user__company__admin')
+            )
+            with rate_limiter.prepaid(
+                    self.user.company_id, "rehive", len(documents)):
+                results = fan_out(
+                    lambda d: d.update_platform_resource(data),
+                    documents,
+                    max_workers=getattr(settings, 'DOCUMENT_UPDATE_WORKERS')
+                )
 
-        # Save the status on the check.
-        self.save()
+            failed = [(d, exc,) for d, result, exc in results if exc]
+            for d, exc in failed:
+                logger.error(
+                    "Document {} update failed: {}".format(d.identifier, exc)
+                )
+
+            # Leave the check unevaluated so that it is retried. The updates
+            # are idempotent so the documents that succeeded are simply resent.
+            if failed:
+                raise CheckProcessingError(
+                    "Failed to update {} of {} documents.".format(
+                        len(failed), len(results)
+                    )
+                )
+
+        self.complete()
+
+    @transaction.atomic
+    def complete(self):
+        """
+        Transition an evaluated check to complete.
+        """
+
+        # Lock on the user to ensure only a single check per user can be
+        # completed at a time.
+        user = User.objects.select_for_update().get(id=self.user.id)
+
+        # Another task may have evaluated the check in the meantime.
+        check = Check.objects.select_for_update().get(id=self.id)
+        if check.status in (CheckStatus.COMPLETE, CheckStatus.FAILED,):
+            return
+
+        # Save the status on the check. Only the status is saved so that the
+        # sweep state set by the sweeper in the meantime is kept.
+        self.status = CheckStatus.COMPLETE
+        self.save(update_fields=['status', 'updated'])
+
+
+class OnfidoResponse(DateModel):
+    """
+    Cached Onfido API response for a company resource.
+
+    Used by the `database` backend of the Onfido response cache.
+    """
+
+    company = models.ForeignKey(
+        'service_onfido.Company', on_delete=models.CASCADE
+    )
+    resource = models.CharField(max_length=64)
+    resource_id = models.CharField(max_length=64)
+    data = models.JSONField()
+    # Size of the serialized response in bytes.
+    size = models.IntegerField(default=0)
+    # Responses without an expiry are final and never expire.
+    expires = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('company', 'resource', 'resource_id',)
+        indexes = [
+            # Keep the purge of expired responses cheap.
+            models.Index(
+                fields=['expires'],
+                condition=Q(expires__isnull=False),
+                name='onfidoresponse_expires_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return "{}:{}".format(self.resource, self.resource_id)
+
+
+class RateLimitBucket(models.Model):
+    """
+    Token bucket used to rate limit outbound calls per company and upstream.
+    """
+
+    company = models.ForeignKey(
+        'service_onfido.Company', on_delete=models.CASCADE
+    )
+    upstream = models.CharField(max_length=32)
+    tokens = models.FloatField()
+    refilled = models.DateTimeField()
+    # Set from the `Retry-After` header of throttled responses.
+    blocked_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('company', 'upstream',)
+
+    def __str__(self):
+        return "{}:{}".format(self.company_id, self.upstream)
+
+
+class TenantTask(DateModel):
+    """
+    Task waiting to be dispatched (or in flight) by the fair scheduler.
+    """
+
+    company = models.ForeignKey(
+        'service_onfido.Company', on_delete=models.CASCADE
+    )
+    task = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    # Set once the task has been published.
+    dispatched = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('task', 'object_id',)
+        indexes = [
+            # Keep the round-robin selection of pending tasks cheap.
+            models.Index(
+                fields=['company', 'task', 'created'],
+                condition=Q(dispatched__isnull=True),
+                name='tenanttask_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return "{}:{}".format(self.task, self.object_id)
+
+
+class OutboxMessage(models.Model):
+    """
+    Task waiting to be published by the transactional outbox.
+    """
+
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return "{}:{}".format(self.task, self.args)
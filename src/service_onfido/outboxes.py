@@ -0,0 +1,115 @@
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from logging import getLogger
+
+from celery import current_app
+from django.db import transaction
+from django.utils.timezone import now
+
+from config import settings
+
+
+logger = getLogger('django')
+
+
+class TransactionalOutbox:
+    """
+    Publish tasks only once the transaction that enqueued them has committed.
+
+    Tasks are written to the `OutboxMessage` table in the caller's transaction
+    and are relayed to the broker in batches after the commit. Messages whose
+    relay was lost (eg. the process died right after the commit) are relayed
+    by the periodic relay task. Messages are deleted in the transaction that
+    publishes them, so a message is only published again if that transaction
+    fails after the publish.
+    """
+
+    def __init__(self, batch_size=100, max_batches=10):
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.published = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, task, *args):
+        """
+        Enqueue a task with arguments.
+        """
+
+        self.enqueue_many(task, [args])
+
+    def enqueue_many(self, task, arguments):
+        """
+        Enqueue a task once for each set of arguments.
+        """
+
+        from service_onfido.models import OutboxMessage
+
+        OutboxMessage.objects.bulk_create([
+            OutboxMessage(task=task.name, args=list(args))
+            for args in arguments
+        ])
+
+        transaction.on_commit(self.relay)
+
+    def _relay_batch(self, min_age):
+        from service_onfido.models import OutboxMessage
+        from service_onfido.tasks import apply_async_many
+
+        with transaction.atomic():
+            queryset = OutboxMessage.objects.select_for_update(
+                skip_locked=True
+            ).order_by('id')
+            if min_age:
+                queryset = queryset.filter(
+                    created__lte=now() - timedelta(seconds=min_age)
+                )
+
+            messages = list(queryset[:self.batch_size])
+            if not messages:
+                return 0
+
+            by_task = defaultdict(list)
+            for m in messages:
+                by_task[m.task].append(tuple(m.args))
+
+            for name, arguments in by_task.items():
+                apply_async_many(current_app.tasks[name], arguments)
+
+            OutboxMessage.objects.filter(
+                id__in=[m.id for m in messages]
+            ).delete()
+
+        with self._lock:
+            self.published += len(messages)
+
+        return len(messages)
+
+    def relay(self, min_age=None):
+        """
+        Publish enqueued messages in batches. Returns the number of published
+        messages.
+
+        min_age: Only publish messages that are at least `min_age` seconds old
+        """
+
+        published = 0
+        for i in range(self.max_batches):
+            count = self._relay_batch(min_age)
+            published += count
+            if count < self.batch_size:
+                break
+
+        return published
+
+    @property
+    def stats(self):
+        return {
+            "published": self.published,
+        }
+
+
+outbox = TransactionalOutbox(
+    batch_size=getattr(settings, 'OUTBOX_BATCH_SIZE'),
+    max_batches=getattr(settings, 'OUTBOX_RELAY_MAX_BATCHES')
+)
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import threading
+from collections import defaultdict
+from logging import getLogger
+
+from config import settings
+from service_onfido.utils.common import ConnectionClosingExecutor
+
+
+logger = getLogger('django')
+
+
+class AsyncPipeline:
+    """
+    Run network-bound model methods concurrently in a single process.
+
+    An asyncio event loop schedules up to `concurrency` calls at a time and at
+    most `company_concurrency` calls per company. The Onfido and Rehive clients
+    are synchronous, so each call runs on a bounded thread pool. Each thread
+    of the pool keeps its database connections open for the whole run, so
+    `concurrency` also bounds the number of database connections of a run.
+    """
+
+    def __init__(self, concurrency=100, company_concurrency=10):
+        self.concurrency = concurrency
+        self.company_concurrency = company_concurrency
+        self.completed = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    async def _gather(self, executor, func, items, keys):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        companies = defaultdict(
+            lambda: asyncio.Semaphore(self.company_concurrency)
+        )
+
+        async def call(item, key):
+            async with semaphore, companies[key]:
+                try:
+                    result = await loop.run_in_executor(
+                        executor, func, item
+                    )
+                except Exception as exc:
+                    return (item, None, exc,)
+                return (item, result, None,)
+
+        return await asyncio.gather(
+            *[call(item, key) for item, key in zip(items, keys)]
+        )
+
+    def run(self, func, items, key=None):
+        """
+        Call `func` for each item concurrently.
+
+        Returns a list of (item, result, exception) tuples in the same order as
+        `items`. Exceptions are returned instead of raised so that one failure
+        does not hide the others.
+
+        func: Callable that accepts an item
+        items: Items to process
+        key: Callable that returns the company of an item
+        """
+
+        items = list(items)
+        if not items:
+            return []
+
+        # Keys are resolved up front because the ORM cannot be used from the
+        # event loop.
+        keys = [key(item) if key else None for item in items]
+
+        # The database connections of the pool are closed once all the calls
+        # are done.
+        start = time.perf_counter()
+        with ConnectionClosingExecutor(
+                max_workers=min(self.concurrency, len(items))) as executor:
+            results = asyncio.run(self._gather(executor, func, items, keys))
+
+        with self._lock:
+            self.failed += sum(1 for r in results if r[2] is not None)
+            self.completed += sum(1 for r in results if r[2] is None)
+            self.elapsed += time.perf_counter() - start
+
+        return results
+
+    @property
+    def stats(self):
+        processed = self.completed + self.failed
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "throughput": processed / self.elapsed if self.elapsed else 0.0,
+        }
+
+
+async_pipeline = AsyncPipeline(
+    concurrency=getattr(settings, 'PIPELINE_CONCURRENCY'),
+    company_concurrency=getattr(settings, 'PIPELINE_COMPANY_CONCURRENCY')
+)
@@ -1,11 +1,25 @@
+from celery.signals import task_postrun
 from django.dispatch import receiver
-from django.db.models.signals import post_save, m2m_changed
+from django.core.signals import request_finished
+from django.db.models.signals import post_save, post_delete, m2m_changed
 
-from service_onfido.models import Document, Check
+from service_onfido.models import Company, Document, Check
 from service_onfido.enums import CheckStatus
+from service_onfido.registries import company_registry
+from service_onfido.reporters import stats_reporter
 from service_onfido import tasks
 
 
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def company_post_change(sender, instance, **kwargs):
+    """
+    Invalidate the cached company so that changes take effect immediately.
+    """
+
+    company_registry.invalidate(instance.identifier)
+
+
 @receiver(post_save, sender=Document)
 def document_post_save(sender, instance, created, **kwargs):
     """
@@ -32,22 +46,31 @@ def check_post_save(sender, instance, created, **kwargs):
             ):
         return
 
-    # Get the first check that is currently processing.
-    processing_check = Check.objects.filter(
-        status=CheckStatus.PROCESSING,
-        user=instance.user
-    ).order_by("created").first()
-
-    # Get the next pending check (the one that must be processed next).
-    next_pending_check = Check.objects.filter(
-        status=CheckStatus.PENDING,
-        user=instance.user
-    ).order_by("created").first()
+    # Get the head of the user's check queue.
+    head = Check.objects.queue_head(instance.user_id)
 
     # There is an already processing check.
     # OR there is no next pending check to process.
-    if processing_check or not next_pending_check:
+    if not head or head.status != CheckStatus.PENDING:
         return
 
     # Generate the onfido resource (transitions the check to processing).
-    next_pending_check.generate_async()
+    head.generate_async()
+
+
+@receiver(request_finished)
+def stats_request_finished(sender, **kwargs):
+    """
+    Log the process stats periodically in web processes.
+    """
+
+    stats_reporter.tick()
+
+
+@task_postrun.connect
+def stats_task_postrun(sender=None, **kwargs):
+    """
+    Log the process stats periodically in worker processes.
+    """
+
+    stats_reporter.tick()
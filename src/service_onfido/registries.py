@@ -0,0 +1,100 @@
+from collections import namedtuple
+from logging import getLogger
+
+from config import settings
+from service_onfido.models import Company
+from service_onfido.utils.cache import TTLCache
+
+
+logger = getLogger('django')
+
+
+class CompanyEntry(namedtuple('CompanyEntry', (
+        'id',
+        'identifier',
+        'secret',
+        'onfido_webhook_token',
+        'onfido_api_key',
+        'active',
+        'configured',))):
+    """
+    Snapshot of the company fields required to validate inbound webhooks.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        return self.identifier
+
+
+class CompanyRegistry:
+    """
+    Process-local registry of companies keyed by identifier.
+
+    Known companies are cached as `CompanyEntry` snapshots and unknown
+    identifiers are remembered for a short time so that repeated requests for
+    deleted or invalid companies do not reach the database. Entries are
+    invalidated by the company `post_save` and `post_delete` receivers.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30, missing_ttl=10):
+        self.companies = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.missing = TTLCache(maxsize=maxsize, ttl=missing_ttl)
+
+    def get(self, identifier):
+        """
+        Get a company entry using an identifier. Returns None if the company
+        does not exist.
+        """
+
+        entry = self.companies.get(identifier)
+        if entry is not None:
+            return entry
+
+        if self.missing.get(identifier) is not None:
+            return None
+
+        try:
+            company = Company.objects.get(identifier=identifier)
+        except Company.DoesNotExist:
+            self.missing.set(identifier, True)
+            return None
+
+        entry = CompanyEntry(
+            id=company.id,
+            identifier=company.identifier,
+            secret=str(company.secret),
+            onfido_webhook_token=company.onfido_webhook_token,
+            onfido_api_key=company.onfido_api_key,
+            active=company.active,
+            configured=company.configured
+        )
+        self.companies.set(identifier, entry)
+
+        return entry
+
+    def invalidate(self, identifier):
+        """
+        Remove a company identifier from the registry.
+        """
+
+        self.companies.delete(identifier)
+        self.missing.delete(identifier)
+
+    def clear(self):
+        self.companies.clear()
+        self.missing.clear()
+
+    @property
+    def stats(self):
+        return {
+            "companies": self.companies.stats,
+            "missing": self.missing.stats,
+        }
+
+
+company_registry = CompanyRegistry(
+    maxsize=getattr(settings, 'COMPANY_CACHE_MAX_SIZE'),
+    ttl=getattr(settings, 'COMPANY_CACHE_TTL'),
+    missing_ttl=getattr(settings, 'COMPANY_CACHE_MISSING_TTL')
+)
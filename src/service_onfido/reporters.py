@@ -0,0 +1,62 @@
+import time
+import threading
+from logging import getLogger
+
+from config import settings
+
+
+logger = getLogger('django')
+
+
+class StatsReporter:
+    """
+    Periodically log the stats of process-local components.
+
+    Components expose their counters with a `stats` property and are
+    registered by name. The stats are logged at most once every `interval`
+    seconds, whenever `tick` is called (eg. after each request or task).
+    """
+
+    def __init__(self, interval=300):
+        self.interval = interval
+        self.sources = {}
+        self._reported = time.monotonic()
+        self._lock = threading.Lock()
+
+    def register(self, name, source):
+        """
+        Register a component with a `stats` property.
+        """
+
+        self.sources[name] = source
+
+    def report(self):
+        """
+        Log the stats of every registered component.
+        """
+
+        for name, source in list(self.sources.items()):
+            try:
+                logger.info("Stats for {}: {}".format(name, source.stats))
+            except Exception as exc:
+                logger.exception(exc)
+
+    def tick(self):
+        """
+        Log the stats if `interval` seconds have passed since the last report.
+        """
+
+        if not self.interval:
+            return
+
+        with self._lock:
+            if time.monotonic() - self._reported < self.interval:
+                return
+            self._reported = time.monotonic()
+
+        self.report()
+
+
+stats_reporter = StatsReporter(
+    interval=getattr(settings, 'STATS_LOG_INTERVAL')
+)
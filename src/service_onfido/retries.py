@@ -0,0 +1,167 @@
+import random
+from logging import getLogger
+
+from celery.exceptions import Ignore
+
+from config import settings
+from service_onfido.exceptions import (
+    OnfidoException, PermanentError, RateLimitError
+)
+from service_onfido.limiters import rate_limiter
+from service_onfido.breakers import get_circuit_error
+
+
+logger = getLogger('django')
+
+
+# Client errors that are worth retrying.
+RETRYABLE_STATUS_CODES = (408, 425, 429,)
+
+
+def get_status_code(exc):
+    """
+    Get the HTTP status code of an exception (or of the exceptions that caused
+    it). Returns None if there is no status code.
+    """
+
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+
+        # Service exceptions carry the status code of their own API response,
+        # so only look at the exceptions that caused them.
+        if not isinstance(exc, OnfidoException):
+            status_code = getattr(exc, "status_code", None)
+            if status_code is None:
+                response = getattr(exc, "response", None)
+                status_code = getattr(response, "status_code", None)
+            if isinstance(status_code, int):
+                return status_code
+
+        exc = exc.__cause__ or exc.__context__
+
+    return None
+
+
+def is_permanent(exc):
+    """
+    Check whether an exception (or one of the exceptions that caused it) is a
+    permanent error.
+    """
+
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+
+        if isinstance(exc, PermanentError):
+            return True
+
+        exc = exc.__cause__ or exc.__context__
+
+    return False
+
+
+def is_retryable(exc):
+    """
+    Check whether an exception is worth retrying. Permanent errors (eg.
+    invalid data or configuration) and client errors (eg. 4xx validation
+    errors) fail the same way every time and are not retried.
+    """
+
+    if is_permanent(exc):
+        return False
+
+    status_code = get_status_code(exc)
+
+    return not (
+        status_code
+        and 400 <= status_code < 500
+        and status_code not in RETRYABLE_STATUS_CODES
+    )
+
+
+class RetryPolicy:
+    """
+    Retry policy for tasks.
+
+    Retries use exponential backoff with full jitter so that workers do not
+    retry in lockstep after an outage. Exceptions that are not retryable fail
+    immediately and each company has a retry budget (a token bucket in the
+    rate limiter) so that a failing tenant cannot flood the queues.
+
+    Tasks that failed because a circuit breaker is open are deferred until the
+    circuit can be probed again without using up a retry or the budget.
+    """
+
+    def __init__(self, max_retries=5, backoff=None, backoff_max=None,
+            budget=True):
+        self.max_retries = max_retries
+        self.backoff = (
+            backoff if backoff is not None
+            else getattr(settings, 'RETRY_BACKOFF')
+        )
+        self.backoff_max = (
+            backoff_max if backoff_max is not None
+            else getattr(settings, 'RETRY_BACKOFF_MAX')
+        )
+        self.budget = budget
+
+    def get_countdown(self, retries):
+        """
+        Get a random countdown for a retry (full jitter).
+        """
+
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff * 2 ** retries)
+        )
+
+    def retry(self, task, exc, company_id=None):
+        """
+        Retry a task that failed with an exception. Raises the exception
+        instead if the task should not be retried.
+        """
+
+        circuit = get_circuit_error(exc)
+        if circuit and not task.request.is_eager:
+            self.defer(task, circuit.retry_after or self.backoff)
+
+        if not is_retryable(exc):
+            logger.warning("{} failed and will not be retried: {}".format(
+                task.name, exc
+            ))
+            raise exc
+
+        if task.request.retries >= self.max_retries:
+            logger.warning("{} exceeded max retries.".format(task.name))
+            raise exc
+
+        if self.budget and company_id is not None:
+            try:
+                rate_limiter.acquire(company_id, "retries", max_wait=0)
+            except RateLimitError:
+                logger.warning(
+                    "{} exceeded the retry budget of company {}.".format(
+                        task.name, company_id
+                    )
+                )
+                raise exc
+
+        raise task.retry(
+            exc=exc,
+            countdown=self.get_countdown(task.request.retries),
+            max_retries=self.max_retries
+        )
+
+    def defer(self, task, delay):
+        """
+        Re-publish a task (with the same id and number of retries) after a
+        delay and stop the current run.
+        """
+
+        countdown = delay + random.uniform(0, self.backoff)
+        logger.warning("{} deferred for {:.0f} seconds.".format(
+            task.name, countdown
+        ))
+        task.signature_from_request(countdown=countdown).apply_async()
+
+        raise Ignore()
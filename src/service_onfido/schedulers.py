@@ -0,0 +1,251 @@
+import zlib
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from logging import getLogger
+
+from celery import current_app
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils.timezone import now
+
+from config import settings
+from service_onfido.outboxes import outbox
+
+
+logger = getLogger('django')
+
+
+class FairScheduler:
+    """
+    Dispatch tasks fairly between companies.
+
+    Tasks are submitted as `TenantTask` rows instead of being published
+    directly. The dispatcher publishes pending tasks in round-robin order
+    across companies and keeps at most `max_in_flight` tasks of each type in
+    flight per company, so a single company with a large backlog cannot
+    starve the others. Tasks release their row when they finish (see
+    `tasks.FairTask`). Rows that stay in flight for longer than `lease`
+    seconds are assumed to be lost and are dispatched again.
+
+    Tasks with an entry in `pipelines` are published as a single pipeline task
+    per dispatch that receives all the dispatched object IDs (see
+    `pipelines.AsyncPipeline`).
+    """
+
+    # Key of the advisory lock that serializes dispatchers.
+    LOCK_KEY = zlib.crc32(b"service_onfido.schedulers.FairScheduler")
+
+    def __init__(self, max_in_flight=10, batch_size=100, lease=3600,
+            pipelines=None):
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.lease = lease
+        # Mapping of task names to the names of their pipeline tasks.
+        self.pipelines = pipelines or {}
+        self.dispatched = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def submit(self, task, company_id, object_id):
+        """
+        Submit a task for an object. Duplicate submissions of a task for the
+        same object are ignored until the task has finished.
+        """
+
+        self.submit_many(task, [(company_id, object_id,)])
+
+    def submit_many(self, task, items):
+        """
+        Submit a task for several (company ID, object ID) pairs.
+        """
+
+        from service_onfido.models import TenantTask
+
+        TenantTask.objects.bulk_create(
+            [
+                TenantTask(
+                    company_id=company_id,
+                    task=task.name,
+                    object_id=object_id
+                )
+                for company_id, object_id in items
+            ],
+            ignore_conflicts=True
+        )
+
+        transaction.on_commit(self.dispatch)
+
+    def release(self, task, object_id):
+        """
+        Remove a finished task and dispatch the next tasks.
+        """
+
+        self.release_many(task, [object_id])
+
+    def release_many(self, task, object_ids):
+        """
+        Remove finished tasks for several objects and dispatch the next tasks.
+        """
+
+        from service_onfido.models import TenantTask
+
+        deleted, _ = TenantTask.objects.filter(
+            task=task.name, object_id__in=object_ids
+        ).delete()
+
+        if deleted:
+            transaction.on_commit(self.dispatch)
+
+    def _get_slots(self):
+        """
+        Get the number of free slots for each (company, task) with pending
+        tasks.
+        """
+
+        from service_onfido.models import TenantTask
+
+        counts = TenantTask.objects.values('company_id', 'task').annotate(
+            pending=Count('id', filter=Q(dispatched__isnull=True)),
+            in_flight=Count('id', filter=Q(dispatched__isnull=False))
+        ).filter(pending__gt=0)
+
+        return {
+            (c['company_id'], c['task'],): min(
+                self.max_in_flight - c['in_flight'], c['pending']
+            )
+            for c in counts
+            if c['in_flight'] < self.max_in_flight
+        }
+
+    @transaction.atomic
+    def dispatch(self):
+        """
+        Publish pending tasks in round-robin order across companies. Returns
+        the number of published tasks.
+
+        Only one dispatcher runs at a time. If another dispatch is already
+        running this returns immediately, and the tasks it did not see are
+        picked up by the next release or the periodic dispatch.
+        """
+
+        from service_onfido.models import TenantTask
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_try_advisory_xact_lock(%s)", [self.LOCK_KEY]
+            )
+            if not cursor.fetchone()[0]:
+                return 0
+
+        # Recover tasks whose lease has expired.
+        TenantTask.objects.filter(
+            dispatched__lt=now() - timedelta(seconds=self.lease)
+        ).update(dispatched=None)
+
+        queues = []
+        for (company_id, task), slots in self._get_slots().items():
+            queues.append(list(
+                TenantTask.objects.filter(
+                    company_id=company_id,
+                    task=task,
+                    dispatched__isnull=True
+                ).order_by('created')[:min(slots, self.batch_size)]
+            ))
+
+        # Interleave the companies so that they are published in turns.
+        selected = []
+        for i in range(max([len(q) for q in queues], default=0)):
+            selected.extend(q[i] for q in queues if i < len(q))
+        selected = selected[:self.batch_size]
+
+        if not selected:
+            return 0
+
+        dispatched = now()
+        for t in selected:
+            t.dispatched = dispatched
+        TenantTask.objects.bulk_update(selected, ['dispatched'])
+
+        with self._lock:
+            self.dispatched += len(selected)
+            self.waited += sum(
+                (dispatched - t.created).total_seconds() for t in selected
+            )
+
+        self._publish(selected)
+
+        return len(selected)
+
+    def _publish(self, selected):
+        """
+        Publish the selected tasks through the outbox, so that they are only
+        published once the dispatch has committed.
+        """
+
+        by_task = defaultdict(list)
+        for t in selected:
+            by_task[t.task].append((t.object_id,))
+
+        for name, arguments in by_task.items():
+            if name in self.pipelines:
+                outbox.enqueue(
+                    current_app.tasks[self.pipelines[name]],
+                    [a[0] for a in arguments]
+                )
+            else:
+                outbox.enqueue_many(current_app.tasks[name], arguments)
+
+    def backlog(self):
+        """
+        Get the backlog of each company: the number of pending and in flight
+        tasks and the wait time of the oldest pending task in seconds.
+        """
+
+        from service_onfido.models import TenantTask
+
+        rows = TenantTask.objects.values(
+            'company__identifier', 'task'
+        ).annotate(
+            pending=Count('id', filter=Q(dispatched__isnull=True)),
+            in_flight=Count('id', filter=Q(dispatched__isnull=False)),
+            oldest=Min('created', filter=Q(dispatched__isnull=True))
+        ).order_by('company__identifier', 'task')
+
+        return [
+            {
+                "company": r['company__identifier'],
+                "task": r['task'],
+                "pending": r['pending'],
+                "in_flight": r['in_flight'],
+                "wait": (
+                    (now() - r['oldest']).total_seconds()
+                    if r['oldest'] else 0.0
+                ),
+            }
+            for r in rows
+        ]
+
+    @property
+    def stats(self):
+        return {
+            "dispatched": self.dispatched,
+            "average_wait": (
+                self.waited / self.dispatched if self.dispatched else 0.0
+            ),
+        }
+
+
+fair_scheduler = FairScheduler(
+    max_in_flight=getattr(settings, 'FAIR_MAX_IN_FLIGHT'),
+    batch_size=getattr(settings, 'FAIR_DISPATCH_BATCH_SIZE'),
+    lease=getattr(settings, 'FAIR_LEASE'),
+    pipelines={
+        'service_onfido.tasks.generate_document': (
+            'service_onfido.tasks.pipeline_generate_documents'
+        ),
+        'service_onfido.tasks.generate_check': (
+            'service_onfido.tasks.pipeline_generate_checks'
+        ),
+    } if getattr(settings, 'ASYNC_PIPELINE') else None
+)
@@ -1,23 +1,30 @@
 import uuid
 import re
+import hmac
 
 from onfido.webhook_event_verifier import WebhookEventVerifier
 from onfido.exceptions import OnfidoInvalidSignatureError
-from rehive import Rehive, APIException
+from rehive import APIException
 from rest_framework import serializers, exceptions
-from django.db import transaction, IntegrityError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from drf_rehive_extras.serializers import BaseModelSerializer
 from drf_rehive_extras.fields import MetadataField, TimestampField, EnumField
 
 from config import settings
 from service_onfido.enums import (
-    WebhookEvent, OnfidoDocumentType, DocumentTypeSide
+    WebhookEvent, OnfidoDocumentType, DocumentTypeSide, ProvisioningStatus
 )
 from service_onfido.models import (
-    Company, User, DocumentType, PlatformWebhook, OnfidoWebhook
+    Company, User, DocumentType, PlatformWebhook, OnfidoWebhook,
+    Provisioning
 )
-from service_onfido.authentication import HeaderAuthentication
+from service_onfido.exceptions import ProvisioningError
+from service_onfido.authentication import (
+    HeaderAuthentication, invalidate_company_tokens
+)
+from service_onfido.registries import company_registry
+from service_onfido.utils.clients import rehive_clients
 
 from logging import getLogger
 
@@ -36,7 +43,7 @@ class ActivateSerializer(serializers.Serializer):
 
     def validate(self, validated_data):
         token = validated_data.get('token')
-        rehive = Rehive(token)
+        rehive = rehive_clients.get(token)
 
         try:
             user = rehive.auth.get()
@@ -64,7 +71,7 @@ class ActivateSerializer(serializers.Serializer):
         rehive_user = validated_data.get('user')
         rehive_company = validated_data.get('company')
 
-        rehive = Rehive(token)
+        rehive = rehive_clients.get(token)
 
         # Activate an existing company.
         try:
@@ -110,6 +117,11 @@ class ActivateSerializer(serializers.Serializer):
 
         # Add required platform webhooks to service automatically.
         platform_webhooks = [
+            {
+                "url": getattr(settings, 'BASE_URL') + 'webhook/',
+                "event": WebhookEvent.USER_CREATE.value,
+                "secret": str(company.secret)
+            },
             {
                 "url": getattr(settings, 'BASE_URL') + 'webhook/',
                 "event": WebhookEvent.DOCUMENT_CREATE.value,
@@ -147,7 +159,7 @@ class DeactivateSerializer(serializers.Serializer):
 
     def validate(self, validated_data):
         token = validated_data.get('token')
-        rehive = Rehive(token)
+        rehive = rehive_clients.get(token)
 
         try:
             user = rehive.auth.get()
@@ -175,6 +187,10 @@ class DeactivateSerializer(serializers.Serializer):
 
         company = validated_data.get('company')
         purge = validated_data.get('purge', False)
+
+        # Ensure cached tokens for the company are no longer accepted.
+        invalidate_company_tokens(company)
+
         if purge is True:
             company.delete()
             return validated_data
@@ -197,14 +213,19 @@ class WebhookSerializer(serializers.Serializer):
     def validate_company(self, company):
         request = self.context['request']
 
+        secret = HeaderAuthentication.get_auth_header(request, name="secret")
+        company = company_registry.get(company)
+
         try:
-            secret = HeaderAuthentication.get_auth_header(
-                request, name="secret"
-            )
-            company = Company.objects.get(
-                identifier=company, secret=secret, active=True
-            )
-        except (Company.DoesNotExist, ValueError):
+            valid = (company is not None
+                and company.active
+                and hmac.compare_digest(
+                    company.secret, str(uuid.UUID(secret))
+                ))
+        except (ValueError, TypeError, AttributeError):
+            valid = False
+
+        if not valid:
             raise serializers.ValidationError("Invalid company.")
 
         return company
@@ -216,19 +237,17 @@ class WebhookSerializer(serializers.Serializer):
         company = validated_data.get('company')
 
         # Log a webhook event so that we have the webhooks state stored and
-        # we can ensure webhooks are handled idempotently.
-        try:
-            webhook = PlatformWebhook.objects.create(
-                identifier=id,
-                company=company,
-                event=WebhookEvent(event),
-                data=data
-            )
-        except IntegrityError:
+        # we can ensure webhooks are handled idempotently. New webhooks are
+        # processed asynchronously.
+        created = PlatformWebhook.objects.ingest(
+            identifier=id,
+            company_id=company.id,
+            event=WebhookEvent(event),
+            data=data
+        )
+        if not created:
             # The webhook has already been received, do nothing.
             logger.info("Webhook already received.")
-        else:
-            webhook.process_async()
 
         return validated_data
 
@@ -245,11 +264,10 @@ class OnfidoWebhookSerializer(serializers.Serializer):
         signature = self.context['request'].META.get('HTTP_X_SHA2_SIGNATURE')
 
         # Check if it is a valid company that is properly configured.
-        try:
-            company = Company.objects.get(
-                identifier=self.context.get('view').kwargs.get('company_id')
-            )
-        except Company.DoesNotExist:
+        company = company_registry.get(
+            self.context.get('view').kwargs.get('company_id')
+        )
+        if company is None:
             raise serializers.ValidationError(
                 {"non_field_errors": ["Invalid company."]}
             )
@@ -292,18 +310,16 @@ class OnfidoWebhookSerializer(serializers.Serializer):
         )
 
         # Log a webhook event so that we have the webhooks state stored and
-        # we can ensure webhooks are handled idempotently.
-        try:
-            webhook = OnfidoWebhook.objects.create(
-                identifier=identifier,
-                company=company,
-                payload=payload
-            )
-        except IntegrityError:
+        # we can ensure webhooks are handled idempotently. New webhooks are
+        # processed asynchronously.
+        created = OnfidoWebhook.objects.ingest(
+            identifier=identifier,
+            company_id=company.id,
+            payload=payload
+        )
+        if not created:
             # The webhook has already been received, do nothing.
             logger.info("Webhook already received.")
-        else:
-            webhook.process_async()
 
         return validated_data
 
@@ -356,3 +372,48 @@ class AdminDocumentTypeSerializer(BaseModelSerializer):
     def validate(self, validated_data):
         validated_data["company"] = self.context.get('request').user.company
         return validated_data
+
+
+class AdminProvisioningSerializer(BaseModelSerializer):
+    id = serializers.CharField(read_only=True, source='identifier')
+    status = EnumField(enum=ProvisioningStatus, read_only=True)
+    created = TimestampField(read_only=True)
+    updated = TimestampField(read_only=True)
+    completed = TimestampField(read_only=True)
+
+    class Meta:
+        model = Provisioning
+        fields = (
+            'id',
+            'status',
+            'processed',
+            'provisioned',
+            'failed',
+            'created',
+            'updated',
+            'completed',
+        )
+        read_only_fields = (
+            'id',
+            'status',
+            'processed',
+            'provisioned',
+            'failed',
+            'created',
+            'updated',
+            'completed',
+        )
+
+    def create(self, validated_data):
+        company = self.context.get('request').user.company
+
+        try:
+            provisioning = Provisioning.objects.start(company)
+        except ProvisioningError as exc:
+            raise serializers.ValidationError(
+                {"non_field_errors": [str(exc)]}
+            )
+
+        provisioning.run_async()
+
+        return provisioning
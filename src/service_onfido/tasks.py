@@ -1,74 +1,160 @@
 import logging
+from collections import defaultdict
 from datetime import timedelta
 
-from celery import shared_task
+from celery import shared_task, Task, states
+from celery.exceptions import Retry, Ignore
+from django.db.models import F, Q
+from django.utils.timezone import now
 
 from config import settings
+from service_onfido.retries import RetryPolicy
 
 
 logger = logging.getLogger('django')
 
 
-@shared_task(acks_late=True, bind=True, default_retry_delay=60)
+def apply_async_many(task, arguments):
+    """
+    Publish a task once for each set of arguments using a single producer.
+    """
+
+    if task.app.conf.task_always_eager:
+        for args in arguments:
+            task.apply_async(args)
+        return
+
+    with task.app.producer_or_acquire() as producer:
+        for args in arguments:
+            task.apply_async(args, producer=producer)
+
+
+def run_pipeline(task, objects, object_ids, func):
+    """
+    Run a fair task for several objects concurrently using the async pipeline.
+
+    Objects that fail with a retryable error are handed to `task` (the
+    synchronous path) so that they are retried using its retry policy. The
+    scheduler slots of the other objects are released.
+    """
+
+    from service_onfido.pipelines import async_pipeline
+    from service_onfido.schedulers import fair_scheduler
+    from service_onfido.retries import is_retryable
+    from service_onfido.breakers import get_circuit_error
+
+    results = async_pipeline.run(
+        func, objects, key=lambda obj: obj.user.company_id
+    )
+
+    retried = set()
+    for obj, result, exc in results:
+        if exc is None:
+            continue
+
+        logger.warning("{} failed for {}: {}".format(task.name, obj.id, exc))
+
+        if is_retryable(exc):
+            circuit = get_circuit_error(exc)
+            task.apply_async(
+                (obj.id,),
+                countdown=(
+                    circuit.retry_after if circuit and circuit.retry_after
+                    else task.retry_policy.get_countdown(0)
+                )
+            )
+            retried.add(obj.id)
+
+    fair_scheduler.release_many(
+        task, [i for i in object_ids if i not in retried]
+    )
+
+
+class FairTask(Task):
+    """
+    Base class for tasks dispatched by the fair scheduler. The scheduler slot
+    is released once the task has finished (but not while it is retrying or
+    deferred).
+    """
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        from service_onfido.schedulers import fair_scheduler
+
+        if status in (states.SUCCESS, states.FAILURE,):
+            fair_scheduler.release(self, args[0])
+
+
+@shared_task(
+    acks_late=True,
+    bind=True,
+    # Matches the max retries of the webhook model.
+    retry_policy=RetryPolicy(max_retries=6, backoff=60)
+)
 def process_platform_webhook(self, webhook_id):
     """
     Task for processing platform webhooks.
     """
 
     from service_onfido.models import PlatformWebhook
-    from service_onfido.exceptions import PlatformWebhookProcessingError
 
-    try:
-        webhook = PlatformWebhook.objects.get(id=webhook_id)
-    except PlatformWebhook.DoesNotExist:
-        logger.error('Platform webhook does not exist.')
+    # Claim the webhook, skip it if it is no longer pending or if it is
+    # already being processed elsewhere (eg. by the webhook drainer). Only
+    # the claim is made in a transaction, the webhook is processed outside
+    # of it.
+    webhooks = PlatformWebhook.objects.claim(ids=[webhook_id])
+    if not webhooks:
+        logger.error('Platform webhook does not exist or is not pending.')
         return
 
+    webhook = webhooks[0]
+
     try:
         webhook.process()
     except Exception as exc:
         try:
-            self.retry(
-                max_retries=PlatformWebhook.MAX_RETRIES,
-                exc=PlatformWebhookProcessingError
-            )
-        except PlatformWebhookProcessingError:
-            logger.info("Platform webhook exceeded max retries.")
+            self.retry_policy.retry(self, exc, webhook.company_id)
+        except (Retry, Ignore,):
+            raise
+        except Exception:
+            logger.info("Platform webhook will not be retried.")
 
 
-@shared_task(acks_late=True, bind=True, default_retry_delay=60)
+@shared_task(
+    acks_late=True,
+    bind=True,
+    # Matches the max retries of the webhook model.
+    retry_policy=RetryPolicy(max_retries=6, backoff=60)
+)
 def process_onfido_webhook(self, webhook_id):
     """
     Task for processing onfido webhooks.
     """
 
     from service_onfido.models import OnfidoWebhook
-    from service_onfido.exceptions import OnfidoWebhookProcessingError
 
-    try:
-        webhook = OnfidoWebhook.objects.get(id=webhook_id)
-    except OnfidoWebhook.DoesNotExist:
-        logger.error('Onfido webhook does not exist.')
+    # Claim the webhook, skip it if it is no longer pending or if it is
+    # already being processed elsewhere (eg. by the webhook drainer). Only
+    # the claim is made in a transaction, the webhook is processed outside
+    # of it.
+    webhooks = OnfidoWebhook.objects.claim(ids=[webhook_id])
+    if not webhooks:
+        logger.error('Onfido webhook does not exist or is not pending.')
         return
 
+    webhook = webhooks[0]
+
     try:
         webhook.process()
     except Exception as exc:
         try:
-            self.retry(
-                max_retries=OnfidoWebhook.MAX_RETRIES,
-                exc=OnfidoWebhookProcessingError
-            )
-        except OnfidoWebhookProcessingError:
-            logger.info("Onfido webhook exceeded max retries.")
+            self.retry_policy.retry(self, exc, webhook.company_id)
+        except (Retry, Ignore,):
+            raise
+        except Exception:
+            logger.info("Onfido webhook will not be retried.")
 
 
-@shared_task(
-    acks_late=True,
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={'max_retries': 5, 'countdown': 10}
-)
+@shared_task(acks_late=True, bind=True, retry_policy=RetryPolicy())
 def generate_user(self, user_id):
     """
     Task for generating users.
@@ -82,14 +168,14 @@ def generate_user(self, user_id):
         logger.error('User does not exist.')
         return
 
-    user.generate()
+    try:
+        user.generate()
+    except Exception as exc:
+        self.retry_policy.retry(self, exc, user.company_id)
 
 
 @shared_task(
-    acks_late=True,
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={'max_retries': 5, 'countdown': 10}
+    acks_late=True, bind=True, base=FairTask, retry_policy=RetryPolicy()
 )
 def generate_document(self, document_id):
     """
@@ -104,14 +190,14 @@ def generate_document(self, document_id):
         logger.error('Document does not exist.')
         return
 
-    document.generate()
+    try:
+        document.generate()
+    except Exception as exc:
+        self.retry_policy.retry(self, exc, document.user.company_id)
 
 
 @shared_task(
-    acks_late=True,
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={'max_retries': 5, 'countdown': 10}
+    acks_late=True, bind=True, base=FairTask, retry_policy=RetryPolicy()
 )
 def generate_check(self, check_id):
     """
@@ -126,14 +212,46 @@ def generate_check(self, check_id):
         logger.error('Check does not exist.')
         return
 
-    check.generate()
+    try:
+        check.generate()
+    except Exception as exc:
+        self.retry_policy.retry(self, exc, check.user.company_id)
+
+
+@shared_task(acks_late=True, bind=True)
+def pipeline_generate_documents(self, document_ids):
+    """
+    Task for generating documents concurrently using the async pipeline.
+    """
+
+    from service_onfido.models import Document
+
+    documents = Document.objects.select_related(
+        'user__company', 'type'
+    ).filter(id__in=document_ids)
+
+    run_pipeline(
+        generate_document, documents, document_ids, lambda d: d.generate()
+    )
+
+
+@shared_task(acks_late=True, bind=True)
+def pipeline_generate_checks(self, check_ids):
+    """
+    Task for generating checks concurrently using the async pipeline.
+    """
+
+    from service_onfido.models import Check
+
+    checks = Check.objects.select_related('user__company').filter(
+        id__in=check_ids
+    )
+
+    run_pipeline(generate_check, checks, check_ids, lambda c: c.generate())
 
 
 @shared_task(
-    acks_late=True,
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={'max_retries': 5, 'countdown': 10}
+    acks_late=True, bind=True, base=FairTask, retry_policy=RetryPolicy()
 )
 def evaluate_check(self, check_id):
     """
@@ -148,4 +266,178 @@ def evaluate_check(self, check_id):
         logger.error('Check does not exist.')
         return
 
-    check.evaluate()
+    try:
+        check.evaluate()
+    except Exception as exc:
+        self.retry_policy.retry(self, exc, check.user.company_id)
+
+
+@shared_task(acks_late=True, bind=True, retry_policy=RetryPolicy())
+def provision_applicants(self, provisioning_id):
+    """
+    Task for provisioning applicants for the users of a company.
+
+    Processes up to `PROVISIONING_TASK_PAGES` pages and then publishes itself
+    again to continue from the checkpoint, so a single run stays short.
+    """
+
+    from service_onfido.models import Provisioning
+
+    try:
+        provisioning = Provisioning.objects.select_related(
+            'company__admin'
+        ).get(id=provisioning_id)
+    except Provisioning.DoesNotExist:
+        logger.error('Provisioning does not exist.')
+        return
+
+    try:
+        completed = provisioning.run(
+            max_pages=getattr(settings, 'PROVISIONING_TASK_PAGES')
+        )
+    except Exception as exc:
+        try:
+            self.retry_policy.retry(self, exc, provisioning.company_id)
+        except (Retry, Ignore,):
+            raise
+        except Exception:
+            provisioning.fail()
+            raise
+
+    if completed is None:
+        logger.info("Provisioning is already running.")
+    elif not completed:
+        provision_applicants.delay(provisioning_id)
+
+
+@shared_task(acks_late=True, bind=True)
+def drain_webhooks(self):
+    """
+    Task for processing pending webhooks in batches.
+
+    Recovers webhooks whose processing task was lost.
+    """
+
+    from service_onfido.models import PlatformWebhook, OnfidoWebhook
+
+    batch_size = getattr(settings, 'WEBHOOK_DRAIN_BATCH_SIZE')
+    min_age = timedelta(seconds=getattr(settings, 'WEBHOOK_DRAIN_MIN_AGE'))
+
+    for model in (PlatformWebhook, OnfidoWebhook,):
+        for i in range(getattr(settings, 'WEBHOOK_DRAIN_MAX_BATCHES')):
+            claimed = model.objects.drain(
+                batch_size=batch_size, min_age=min_age
+            )
+            if claimed < batch_size:
+                break
+
+
+@shared_task(acks_late=True, bind=True)
+def relay_outbox(self):
+    """
+    Task for publishing outbox messages whose relay was lost.
+    """
+
+    from service_onfido.outboxes import outbox
+
+    return outbox.relay(min_age=getattr(settings, 'OUTBOX_RELAY_MIN_AGE'))
+
+
+@shared_task(acks_late=True, bind=True)
+def dispatch_tenant_tasks(self):
+    """
+    Task for dispatching tenant tasks that are waiting for a free slot.
+    """
+
+    from service_onfido.schedulers import fair_scheduler
+
+    return fair_scheduler.dispatch()
+
+
+@shared_task(acks_late=True, bind=True)
+def sweep_stale_resources(self):
+    """
+    Task for re-enqueueing documents and checks whose tasks were lost.
+
+    Stale objects are submitted to the fair scheduler, which ignores objects
+    whose task is still waiting or in flight. Objects that were never swept
+    go first, and each object is swept again with an exponential backoff so
+    that objects that keep failing do not crowd out the others. Expired check
+    claims are released first, so that their checks are generated again.
+    """
+
+    from service_onfido.models import Document, Check
+    from service_onfido.schedulers import fair_scheduler
+
+    min_age = timedelta(seconds=getattr(settings, 'SWEEP_MIN_AGE'))
+    max_age = timedelta(seconds=getattr(settings, 'SWEEP_MAX_AGE'))
+    limit = getattr(settings, 'SWEEP_LIMIT')
+    lease = timedelta(seconds=getattr(settings, 'CHECK_CLAIM_LEASE'))
+
+    released = Check.objects.reclaim_expired(lease)
+    if released:
+        logger.warning("Released {} expired check claims.".format(released))
+
+    sweeps = (
+        (
+            "documents",
+            Document.objects.stale(min_age, max_age),
+            generate_document,
+        ),
+        (
+            "checks",
+            Check.objects.stale(min_age, max_age),
+            evaluate_check,
+        ),
+        (
+            "pending_checks",
+            Check.objects.stalled_heads(min_age, max_age),
+            generate_check,
+        ),
+    )
+
+    counts = {}
+    for name, queryset, task in sweeps:
+        swept = now()
+        objs = list(
+            queryset.filter(
+                Q(next_sweep__isnull=True) | Q(next_sweep__lte=swept)
+            ).select_related('user').only(
+                'id', 'sweeps', 'next_sweep', 'user__company'
+            ).order_by(F('next_sweep').asc(nulls_first=True), 'id')[:limit]
+        )
+
+        # Back off exponentially (up to `max_age`) based on the number of
+        # times each object has been swept.
+        backoff = defaultdict(list)
+        for obj in objs:
+            backoff[obj.sweeps].append(obj.id)
+        for count, ids in backoff.items():
+            queryset.model.objects.filter(id__in=ids).update(
+                sweeps=count + 1,
+                next_sweep=swept + min(min_age * 2 ** count, max_age)
+            )
+
+        items = [(obj.user.company_id, obj.id,) for obj in objs]
+        if items:
+            fair_scheduler.submit_many(task, items)
+        counts[name] = len(items)
+
+    logger.info("Re-submitted stale resources: {}".format(counts))
+
+    return counts
+
+
+@shared_task(acks_late=True, bind=True)
+def purge_response_cache(self):
+    """
+    Task for deleting expired Onfido responses from the response cache.
+    """
+
+    from service_onfido.caches import response_cache
+
+    deleted = response_cache.purge()
+    if deleted:
+        logger.info("Purged {} expired Onfido responses.".format(deleted))
+
+    return deleted
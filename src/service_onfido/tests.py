@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from service_onfido.models import Company, User, Check
+from service_onfido.enums import CheckStatus
+
+
+class CheckQueueTestCase(TestCase):
+    """
+    Guard the number of queries made to advance a user's check queue.
+    """
+
+    def setUp(self):
+        admin = User.objects.create()
+        self.company = Company.objects.create(identifier="test", admin=admin)
+        self.user = User.objects.create(company=self.company)
+
+    def create_check(self, status):
+        check = Check.objects.create(user=self.user)
+        Check.objects.filter(id=check.id).update(status=status)
+        check.status = status
+        return check
+
+    def test_queue_head_with_processing_check(self):
+        processing = self.create_check(CheckStatus.PROCESSING)
+        self.create_check(CheckStatus.PENDING)
+
+        with self.assertNumQueries(1):
+            head = Check.objects.queue_head(self.user.id)
+
+        self.assertEqual(head, processing)
+
+    def test_queue_head_with_pending_checks(self):
+        pending = self.create_check(CheckStatus.PENDING)
+        self.create_check(CheckStatus.PENDING)
+        self.create_check(CheckStatus.COMPLETE)
+
+        with self.assertNumQueries(1):
+            head = Check.objects.queue_head(self.user.id)
+
+        self.assertEqual(head, pending)
+
+    @mock.patch.object(Check, 'generate_async')
+    def test_save_with_processing_check(self, generate_async):
+        self.create_check(CheckStatus.PROCESSING)
+        check = self.create_check(CheckStatus.PENDING)
+
+        # The update and the queue head lookup of `check_post_save`.
+        with self.assertNumQueries(2):
+            check.save()
+
+        generate_async.assert_not_called()
+
+    @mock.patch.object(Check, 'generate_async')
+    def test_save_with_idle_queue(self, generate_async):
+        check = self.create_check(CheckStatus.COMPLETE)
+        self.create_check(CheckStatus.PENDING)
+
+        with self.assertNumQueries(2):
+            check.save()
+
+        generate_async.assert_called_once()
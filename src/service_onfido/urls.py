@@ -33,6 +33,16 @@ urlpatterns = (
         views.AdminDocumentTypeView.as_view(),
         name='admin-documen-type-view'
     ),
+    re_path(
+        r'^admin/provisionings/$',
+        views.AdminListProvisioningView.as_view(),
+        name='admin-provisioning-list'
+    ),
+    re_path(
+        r'^admin/provisionings/(?P<identifier>([a-zA-Z0-9\_\-]+))/$',
+        views.AdminProvisioningView.as_view(),
+        name='admin-provisioning-view'
+    ),
 )
 
 urlpatterns = format_suffix_patterns(urlpatterns)
@@ -0,0 +1,102 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from logging import getLogger
+
+
+logger = getLogger('django')
+
+
+class MicroBatcher:
+    """
+    Collect items submitted by concurrent threads and handle them in batches.
+
+    Items are handled by a single background thread once `max_size` items
+    have been collected or `max_wait` seconds have passed since the first
+    item in the batch was submitted. The `handler` is called with a list of
+    items and must return a list of results in the same order. Each caller
+    receives a future that resolves to the result for its own item.
+    """
+
+    def __init__(self, handler, max_size=100, max_wait=0.005):
+        self.handler = handler
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _is_running(self):
+        return (self._pid == os.getpid()
+            and self._thread is not None
+            and self._thread.is_alive())
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so start one per process.
+        with self._lock:
+            if not self._is_running():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, item):
+        """
+        Submit an item and get a future for its result.
+        """
+
+        if not self._is_running():
+            self._ensure_thread()
+
+        future = Future()
+        self._queue.put((item, future,))
+
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            futures = [f for i, f in batch]
+
+            try:
+                results = self.handler([i for i, f in batch])
+            except Exception as exc:
+                logger.exception(exc)
+                for future in futures:
+                    future.set_exception(exc)
+            else:
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+
+            self.batches += 1
+            self.items += len(batch)
+
+    @property
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "pending": self._queue.qsize(),
+        }
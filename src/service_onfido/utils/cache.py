@@ -0,0 +1,120 @@
+import time
+import threading
+from collections import OrderedDict
+from logging import getLogger
+
+
+logger = getLogger('django')
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe, process-local cache with per-entry expiry.
+
+    Entries are evicted in least recently used order once `maxsize` is
+    reached, and are treated as missing once they are older than `ttl`
+    seconds. Hit and miss counters are kept so that the effectiveness of the
+    cache can be inspected.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._get_entry(key) is not None
+
+    def _get_entry(self, key):
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            return None
+
+        if expires is not None and expires <= self.timer():
+            del self._data[key]
+            return None
+
+        return expires, value
+
+    def get(self, key, default=None):
+        """
+        Get a value from the cache, recording a hit or a miss.
+        """
+
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """
+        Add a value to the cache, evicting the oldest entries if necessary.
+        """
+
+        ttl = self.ttl if ttl is None else ttl
+        expires = self.timer() + ttl if ttl else None
+
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove a single key from the cache.
+        """
+
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, predicate):
+        """
+        Remove every entry whose value matches the `predicate`. Returns the
+        number of entries removed.
+        """
+
+        with self._lock:
+            keys = [k for k, (e, v) in self._data.items() if predicate(v)]
+            for key in keys:
+                del self._data[key]
+
+        return len(keys)
+
+    def clear(self):
+        """
+        Remove all entries from the cache (the counters are kept).
+        """
+
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def stats(self):
+        """
+        Get the current counters for the cache.
+        """
+
+        total = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
@@ -0,0 +1,360 @@
+import os
+import threading
+import functools
+from http.cookiejar import DefaultCookiePolicy
+from collections import OrderedDict
+from logging import getLogger
+
+import requests
+import onfido
+from rehive import Rehive
+from requests.adapters import HTTPAdapter
+from onfido.resource import Resource
+from onfido.exceptions import error_decorator
+from onfido.mimetype import mimetype_from_name
+from onfido.onfido_download import OnfidoDownload
+from onfido.utils import form_data_converter
+
+from config import settings
+from service_onfido.utils.files import MultipartEncoder
+from service_onfido.limiters import rate_limiter, RateLimitedSession
+from service_onfido.breakers import circuit_breakers, CircuitBreakerSession
+
+
+logger = getLogger('django')
+
+
+def get_pool_size(name):
+    """
+    Get the connection pool size from the `name` setting.
+
+    The async pipeline makes up to `PIPELINE_CONCURRENCY` calls at once
+    through the same clients, so pools are at least that large when it is
+    enabled.
+    """
+
+    pool_size = getattr(settings, name)
+    if getattr(settings, 'ASYNC_PIPELINE'):
+        pool_size = max(pool_size, getattr(settings, 'PIPELINE_CONCURRENCY'))
+
+    return pool_size
+
+
+def create_session(pool_size):
+    """
+    Create a keep-alive session with a sized connection pool.
+
+    Sessions are shared between tenants, so cookies are never persisted.
+    """
+
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+class SessionResource:
+    """
+    Mixin for Onfido SDK resources that sends requests through a shared
+    session instead of the module level `requests` functions.
+    """
+
+    def __init__(self, api_token, region, timeout, session):
+        super().__init__(api_token, region, timeout)
+        self._session = session
+
+    @error_decorator
+    def _upload_request(self, path, file, **request_body):
+        # Encode the multipart body incrementally while it is being sent.
+        body = MultipartEncoder(
+            fields=form_data_converter(request_body),
+            files={
+                'file': (file.name, file, mimetype_from_name(file.name))
+            }
+        )
+        headers = dict(self._headers, **{"Content-Type": body.content_type})
+        response = self._session.post(
+            self._build_url(path),
+            data=body,
+            headers=headers,
+            timeout=self._timeout
+        )
+
+        return self._handle_response(response)
+
+    @error_decorator
+    def _post(self, path, **request_body):
+        response = self._session.post(
+            self._build_url(path),
+            json=request_body,
+            headers=self._headers,
+            timeout=self._timeout
+        )
+
+        return self._handle_response(response)
+
+    @error_decorator
+    def _put(self, path, data=None):
+        response = self._session.put(
+            self._build_url(path),
+            json=data,
+            headers=self._headers,
+            timeout=self._timeout
+        )
+
+        return self._handle_response(response)
+
+    @error_decorator
+    def _get(self, path, payload=None):
+        response = self._session.get(
+            self._build_url(path),
+            headers=self._headers,
+            params=payload,
+            timeout=self._timeout
+        )
+
+        return self._handle_response(response)
+
+    @error_decorator
+    def _download_request(self, path):
+        response = self._session.get(
+            self._build_url(path),
+            headers=self._headers,
+            timeout=self._timeout
+        )
+        response.raise_for_status()
+
+        return OnfidoDownload(response)
+
+    @error_decorator
+    def _delete_request(self, path):
+        response = self._session.delete(
+            self._build_url(path),
+            headers=self._headers,
+            timeout=self._timeout
+        )
+
+        return self._handle_response(response)
+
+
+@functools.lru_cache(maxsize=None)
+def get_session_resource_class(resource_class):
+    """
+    Build a session backed version of an Onfido SDK resource class.
+    """
+
+    return type(
+        resource_class.__name__, (SessionResource, resource_class,), {}
+    )
+
+
+class OnfidoClient(onfido.Api):
+    """
+    Onfido API client whose resources share a single keep-alive session.
+    """
+
+    def __init__(self, api_token, region, session, timeout=None):
+        super().__init__(api_token, region, timeout)
+        self.session = session
+        # Number of times the client was handed out by the registry.
+        self.uses = 0
+
+        for name, resource in list(vars(self).items()):
+            if isinstance(resource, Resource):
+                resource_class = get_session_resource_class(type(resource))
+                setattr(
+                    self,
+                    name,
+                    resource_class(api_token, region, timeout, session)
+                )
+
+
+class OnfidoClientRegistry:
+    """
+    Process-local registry of Onfido clients keyed by (API key, region,
+    company). Clients are rate limited using the bucket of their company, so
+    companies that share an API key do not share a client.
+
+    Clients are kept in least recently used order and the oldest client is
+    closed once `maxsize` is reached. The registry is reset if the process
+    forks so that connections are never shared between worker processes.
+    """
+
+    def __init__(self, maxsize=64, pool_size=10, timeout=None):
+        self.maxsize = maxsize
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.created = 0
+        self.evicted = 0
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _check_process(self):
+        # Drop (without closing) clients inherited from a parent process.
+        if self._pid != os.getpid():
+            self._clients = OrderedDict()
+            self._pid = os.getpid()
+
+    def _close(self, client):
+        self.evicted += 1
+        client.session.close()
+
+    def get(self, api_key, region, company_id=None):
+        """
+        Get a client for the API key and region, creating it if necessary.
+
+        Requests made by a new client are guarded by the circuit breaker of
+        the region and rate limited using the bucket of `company_id` (if it is
+        set).
+        """
+
+        key = (api_key, region, company_id,)
+
+        with self._lock:
+            self._check_process()
+
+            try:
+                client = self._clients[key]
+            except KeyError:
+                session = create_session(self.pool_size)
+                if company_id is not None:
+                    session = RateLimitedSession(
+                        session, rate_limiter, company_id, "onfido"
+                    )
+                session = CircuitBreakerSession(
+                    session,
+                    circuit_breakers.get(
+                        "onfido", getattr(region, "name", region)
+                    )
+                )
+                client = OnfidoClient(
+                    api_key, region, session, timeout=self.timeout
+                )
+                self._clients[key] = client
+                self.created += 1
+
+                while len(self._clients) > self.maxsize:
+                    self._close(self._clients.popitem(last=False)[1])
+            else:
+                self._clients.move_to_end(key)
+
+            client.uses += 1
+
+        return client
+
+    def evict(self, api_key):
+        """
+        Close and remove all clients for an API key.
+        """
+
+        with self._lock:
+            self._check_process()
+
+            for key in [k for k in self._clients if k[0] == api_key]:
+                self._close(self._clients.pop(key))
+
+    def clear(self):
+        with self._lock:
+            for client in self._clients.values():
+                self._close(client)
+            self._clients = OrderedDict()
+
+    @property
+    def stats(self):
+        """
+        Get the registry counters and the reuse counters for each client.
+        """
+
+        with self._lock:
+            clients = [
+                {
+                    "api_key": "...{}".format(key[0][-4:]),
+                    "region": key[1].name,
+                    "company": key[2],
+                    "uses": client.uses,
+                }
+                for key, client in self._clients.items()
+            ]
+
+        return {
+            "created": self.created,
+            "evicted": self.evicted,
+            "clients": clients,
+        }
+
+
+class RehiveClientFactory:
+    """
+    Factory for Rehive SDK clients that share one keep-alive session per
+    process.
+
+    The Rehive SDK creates a new session for every client, so the shared
+    session is injected into each client after instantiation.
+    """
+
+    def __init__(self, pool_size=10, timeout=30):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.created = 0
+        self._session = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def session(self):
+        """
+        Get the process session, creating it if necessary.
+        """
+
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                self._session = create_session(self.pool_size)
+                self._pid = os.getpid()
+
+            return self._session
+
+    def get(self, token, company_id=None):
+        """
+        Get a Rehive client for the token.
+
+        Requests are rate limited using the bucket of `company_id` and guarded
+        by the Rehive circuit breaker (if `company_id` is set).
+        """
+
+        rehive = Rehive(token, timeout=self.timeout)
+        rehive.client._session = self.session
+        if company_id is not None:
+            rehive.client._session = CircuitBreakerSession(
+                RateLimitedSession(
+                    self.session, rate_limiter, company_id, "rehive"
+                ),
+                circuit_breakers.get("rehive")
+            )
+        self.created += 1
+
+        return rehive
+
+    @property
+    def stats(self):
+        return {
+            "created": self.created,
+        }
+
+
+onfido_clients = OnfidoClientRegistry(
+    maxsize=getattr(settings, 'ONFIDO_CLIENT_MAX_SIZE'),
+    pool_size=get_pool_size('ONFIDO_POOL_SIZE'),
+    timeout=getattr(settings, 'ONFIDO_TIMEOUT')
+)
+
+rehive_clients = RehiveClientFactory(
+    pool_size=get_pool_size('REHIVE_POOL_SIZE'),
+    timeout=(
+        getattr(settings, 'REHIVE_CONNECT_TIMEOUT'),
+        getattr(settings, 'REHIVE_READ_TIMEOUT'),
+    )
+)
@@ -3,9 +3,13 @@ import time
 import uuid
 import random
 import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from logging import getLogger
 
+from django.db import connections
+
 
 logger = getLogger('django')
 
@@ -37,3 +41,76 @@ def truncate(string, size: int = 300, suffix='...'):
     """
     return "".join((str(string)[:size - len(suffix)], suffix)) \
         if len(str(string)) > size else str(string)
+
+
+class ConnectionClosingExecutor(ThreadPoolExecutor):
+    """
+    Thread pool that closes the database connections of its threads when it
+    is shut down.
+
+    Database connections are per thread, so each worker thread opens its own
+    connections the first time it uses the ORM. They are kept open for the
+    lifetime of the pool (instead of being closed after every call) and are
+    closed by the thread that shuts the pool down.
+    """
+
+    def __init__(self, max_workers=None, **kwargs):
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        super().__init__(
+            max_workers=max_workers, initializer=self._share_connections,
+            **kwargs
+        )
+
+    def _share_connections(self):
+        # Allow the connections of this thread to be closed from another
+        # thread once the pool is shut down.
+        with self._connections_lock:
+            for conn in connections.all():
+                conn.inc_thread_sharing()
+                self._connections.append(conn)
+
+    def shutdown(self, wait=True, **kwargs):
+        super().shutdown(wait=wait, **kwargs)
+
+        # The connections may still be in use if the threads were not joined.
+        if not wait:
+            return
+
+        with self._connections_lock:
+            shared, self._connections = self._connections, []
+
+        for conn in shared:
+            try:
+                conn.close()
+            finally:
+                conn.dec_thread_sharing()
+
+
+def fan_out(func, items, max_workers=8):
+    """
+    Call `func` for each item concurrently using a bounded thread pool.
+
+    Returns a list of (item, result, exception) tuples in the same order as
+    `items`, so callers can handle partial failures. The calls must not use
+    the database connection of the calling thread, the connections they open
+    are closed once all the calls are done.
+    """
+
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return (item, func(item), None,)
+        except Exception as exc:
+            return (item, None, exc,)
+
+    # Avoid the thread pool overhead for a single item.
+    if len(items) == 1 or max_workers <= 1:
+        return [call(item) for item in items]
+
+    with ConnectionClosingExecutor(
+            max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(call, items))
@@ -0,0 +1,217 @@
+import os
+import uuid
+from tempfile import SpooledTemporaryFile
+from logging import getLogger
+
+import requests
+from rest_framework import status
+
+from service_onfido.exceptions import (
+    DocumentProcessingError, InvalidDocumentError
+)
+
+
+logger = getLogger('django')
+
+
+class NamedSpooledTemporaryFile(SpooledTemporaryFile):
+    """
+    Spooled temporary file with a fixed name.
+
+    The Onfido SDK uses the file name to determine the mimetype of uploads.
+    """
+
+    def __init__(self, name, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def size(self):
+        """
+        Get the size of the file without changing the current position.
+        """
+
+        position = self.tell()
+        self.seek(0, os.SEEK_END)
+        size = self.tell()
+        self.seek(position)
+
+        return size
+
+
+def get_filename_from_url(url):
+    """
+    Get a file name from a (possibly signed) file URL.
+    """
+
+    return os.path.basename(url).split("?")[0]
+
+
+def download_file(url, session=None, max_size=None, spool_size=1048576,
+        chunk_size=65536, timeout=None):
+    """
+    Stream a remote file into a temporary file.
+
+    The file is kept in memory until it exceeds `spool_size` bytes, after
+    which it is written to disk. Files larger than `max_size` bytes are
+    rejected without being read in full. The caller is responsible for closing
+    the returned file.
+
+    url: The URL of the file
+    session: Optional session used to make the request
+    max_size: Max size of the file in bytes
+    spool_size: Max number of bytes that are kept in memory
+    chunk_size: Number of bytes read from the response at a time
+    timeout: Timeout for the request
+    """
+
+    session = session or requests
+
+    with session.get(url, stream=True, timeout=timeout) as res:
+        # Client errors are permanent, server errors are worth retrying.
+        if 400 <= res.status_code < 500:
+            raise InvalidDocumentError("Invalid document file.")
+        elif res.status_code != status.HTTP_200_OK:
+            raise DocumentProcessingError("Unable to download document file.")
+
+        # Reject the file early if the declared size is too large.
+        try:
+            length = int(res.headers.get("Content-Length"))
+        except (TypeError, ValueError):
+            length = None
+        if max_size and length and length > max_size:
+            raise InvalidDocumentError("The document file is too large.")
+
+        file = NamedSpooledTemporaryFile(
+            get_filename_from_url(url), max_size=spool_size
+        )
+
+        try:
+            size = 0
+            for chunk in res.iter_content(chunk_size=chunk_size):
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise InvalidDocumentError(
+                        "The document file is too large."
+                    )
+                file.write(chunk)
+        except BaseException:
+            file.close()
+            raise
+
+    file.seek(0)
+
+    return file
+
+
+def get_file_size(file):
+    """
+    Get the number of bytes remaining in a file from its current position.
+    """
+
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell() - position
+    file.seek(position)
+
+    return size
+
+
+class MultipartEncoder:
+    """
+    File-like `multipart/form-data` body that is generated incrementally.
+
+    Files are read in `chunk_size` chunks as the body is consumed, so the
+    memory used by an upload does not depend on the size of the files. The
+    length of the body is known up front so that requests can send a
+    `Content-Length` header instead of using a chunked transfer encoding.
+
+    fields: Dictionary of form field names and values
+    files: Dictionary of form field names and (name, file, content type)
+    """
+
+    def __init__(self, fields=None, files=None, boundary=None,
+            chunk_size=65536):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self._parts = []
+        self._buffer = b""
+
+        for name, value in (fields or {}).items():
+            self._parts.append(
+                self._get_part_header(name) + str(value).encode() + b"\r\n"
+            )
+
+        for name, (filename, file, content_type) in (files or {}).items():
+            self._parts.append(
+                self._get_part_header(name, filename, content_type)
+            )
+            self._parts.append(file)
+            self._parts.append(b"\r\n")
+
+        self._parts.append("--{}--\r\n".format(self.boundary).encode())
+
+        self._length = sum(
+            len(p) if isinstance(p, bytes) else get_file_size(p)
+            for p in self._parts
+        )
+        self._chunks = self._generate()
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b"")
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary={}".format(self.boundary)
+
+    def _get_part_header(self, name, filename=None, content_type=None):
+        disposition = 'form-data; name="{}"'.format(name.replace('"', '%22'))
+        if filename is not None:
+            disposition += '; filename="{}"'.format(
+                filename.replace('"', '%22')
+            )
+
+        header = "--{}\r\nContent-Disposition: {}\r\n".format(
+            self.boundary, disposition
+        )
+        if content_type:
+            header += "Content-Type: {}\r\n".format(content_type)
+
+        return (header + "\r\n").encode()
+
+    def _generate(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+
+            while True:
+                chunk = part.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def read(self, size=-1):
+        """
+        Read up to `size` bytes of the body (or the rest of the body).
+        """
+
+        while size is None or size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
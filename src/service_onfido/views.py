@@ -9,6 +9,7 @@ from rest_framework.renderers import JSONRenderer
 from drf_rehive_extras.generics import *
 from drf_rehive_extras.serializers import ActionResponseSerializer
 from django.conf import settings as django_settings
+from django.core.exceptions import ValidationError
 
 from config import settings
 from service_onfido.authentication import *
@@ -125,3 +126,30 @@ class AdminDocumentTypeView(RetrieveUpdateAPIView):
             )
         except DocumentType.DoesNotExist:
             raise exceptions.NotFound()
+
+
+class AdminListProvisioningView(ListCreateAPIView):
+    serializer_class = AdminProvisioningSerializer
+    authentication_classes = (AdminAuthentication,)
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Provisioning.objects.none()
+
+        return Provisioning.objects.filter(
+            company=self.request.user.company
+        ).order_by('-created')
+
+
+class AdminProvisioningView(RetrieveAPIView):
+    serializer_class = AdminProvisioningSerializer
+    authentication_classes = (AdminAuthentication,)
+
+    def get_object(self):
+        try:
+            return Provisioning.objects.get(
+                identifier=self.kwargs.get('identifier'),
+                company=self.request.user.company
+            )
+        except (Provisioning.DoesNotExist, ValidationError):
+            raise exceptions.NotFound()